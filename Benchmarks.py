@@ -0,0 +1,745 @@
+import gc
+import importlib.util
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Color formatting
+RED = '\033[91m'
+GREEN = '\033[92m'
+YELLOW = '\033[93m'
+ENDC = '\033[0m'
+
+ROOT = Path(__file__).parent
+
+def load_script(part, question):
+    # The submissions are standalone scripts, so load them by path
+    path = ROOT / "Submissions" / part / f"q{question}.py"
+    spec = importlib.util.spec_from_file_location(f"{part.lower()}_q{question}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def timed(fn, *args, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def report(name, baseline, candidate):
+    speedup = baseline / candidate if candidate else float("inf")
+    color = GREEN if speedup >= 1 else RED
+    print(f"  {name}: {baseline * 1000:.1f} ms -> {candidate * 1000:.1f} ms {color}({speedup:.1f}x){ENDC}")
+
+def random_model_json(size, seed=0):
+    rng = random.Random(seed)
+    domain = [str(i) for i in range(size)]
+    interpretations = {
+        "s": { d: domain[min(i + 1, size - 1)] for i, d in enumerate(domain) },
+        "f": { f"{a},{b}": rng.choice(domain) for a in domain for b in domain },
+        "P": [d for d in domain if rng.random() < 0.5],
+        "R": [f"{a},{b}" for a in domain for b in domain if rng.random() < 0.3],
+        "0": "0",
+    }
+    return json.dumps({ "domain": domain, "interpretations": interpretations })
+
+def random_formula(rng, depth, bound=()):
+    variables = list(bound) or ["0"]
+    if depth == 0:
+        term = lambda: rng.choice(variables + ["0"])
+        atom = rng.randrange(4)
+        if atom == 0:
+            return f"P({term()})"
+        if atom == 1:
+            return f"R({term()},{term()})"
+        if atom == 2:
+            return f"=(s({term()}),{term()})"
+        return f"P(f({term()},{term()}))"
+    kind = rng.randrange(6)
+    if kind < 2:
+        var = "xyzw"[len(bound) % 4]
+        return f"{'@#'[kind]}{var}({random_formula(rng, depth - 1, bound + (var,))})"
+    if kind == 2:
+        return f"!({random_formula(rng, depth - 1, bound)})"
+    op = "&|>"[kind - 3]
+    return f"{op}({random_formula(rng, depth - 1, bound)},{random_formula(rng, depth - 1, bound)})"
+
+def random_formulas(count, depth, seed=0):
+    rng = random.Random(seed)
+    return [random_formula(rng, depth) for _ in range(count)]
+
+def bench_compiled_evaluator():
+    q4 = load_script("A", 4)
+    model = q4.Model.from_json(random_model_json(40))
+    exprs = [q4.nnf_simplify(q4.parse_prefix_string(f)) for f in random_formulas(60, 6)]
+
+    walk = lambda: [q4.evaluate_expression(model, e) for e in exprs]
+    compiled = lambda: [q4.evaluate_compiled(model, e) for e in exprs]
+    walk_time, expected = timed(walk)
+    compiled_time, actual = timed(compiled)
+    assert expected == actual, "compiled evaluator disagrees with the tree walker"
+    report("tree walker vs compiled closures", walk_time, compiled_time)
+
+def bench_numpy_evaluator():
+    q4 = load_script("A", 4)
+    if q4.np is None:
+        print(f"  {YELLOW}numpy is not installed, skipping{ENDC}")
+        return
+    model = q4.Model.from_json(random_model_json(150))
+    formulas = [
+        "@x(@y(>(R(x,y),#z(&(R(y,z),P(f(x,z)))))))",
+        "@x(#y(&(=(s(x),y),|(P(y),!(P(x))))))",
+        "#x(@y(|(R(x,y),=(f(x,y),s(y)))))",
+    ]
+    exprs = [q4.nnf_simplify(q4.parse_prefix_string(f)) for f in formulas]
+
+    compiled = lambda: [q4.evaluate_compiled(model, e) for e in exprs]
+    vectorised = lambda: [q4.evaluate_numpy(model, e) for e in exprs]
+    compiled_time, expected = timed(compiled, repeat=1)
+    numpy_time, actual = timed(vectorised)
+    assert expected == actual, "numpy backend disagrees with the compiled evaluator"
+    report("compiled closures vs numpy tensors", compiled_time, numpy_time)
+
+def bench_interned_model():
+    q4 = load_script("A", 4)
+    size = 1000
+    domain = [str(i) for i in range(size)]
+    model_json = json.dumps({
+        "domain": domain,
+        "interpretations": { "f": { f"{a},{b}": b for a in domain for b in domain }, "0": "0" },
+    })
+
+    tracemalloc.start()
+    data = json.loads(model_json)
+    json_bytes = tracemalloc.get_traced_memory()[0]
+    del data
+    tracemalloc.stop()
+    tracemalloc.start()
+    model = q4.Model.from_json(model_json)
+    model_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"  resident {size * size} entry function: JSON {json_bytes / 2**20:.1f} MiB -> tables {model_bytes / 2**20:.1f} MiB")
+
+    table = json.loads(model_json)["interpretations"]["f"]
+    pairs = [(str(i % size), str(i * 7 % size)) for i in range(200000)]
+    id_pairs = [(model.ids[a], model.ids[b]) for a, b in pairs]
+    function = model.function("f", 2)
+    string_lookup = lambda: [table[",".join([a, b])] for a, b in pairs]
+    id_lookup = lambda: [function.values[a * size + b] for a, b in id_pairs]
+    report("string key vs interned id lookup", timed(string_lookup)[0], timed(id_lookup)[0])
+
+def copying_evaluate(q4, model, expr):
+    # The previous environment strategy: one env.copy() per quantifier iteration
+    def eval_expr(e, env):
+        v = e.value
+        if v == q4.Alphabet.equality:
+            return eval_term(e.left, env) == eval_term(e.right, env)
+        if v == q4.Alphabet.negation:
+            return not eval_expr(e.child, env)
+        if v == q4.Alphabet.conjunction:
+            return eval_expr(e.left, env) and eval_expr(e.right, env)
+        if v == q4.Alphabet.disjunction:
+            return eval_expr(e.left, env) or eval_expr(e.right, env)
+        if v[0] in "@#":
+            for val in model.domain_ids:
+                env[v[1:]] = val
+                if eval_expr(e.child, env.copy()) != (v[0] == "@"):
+                    return v[0] == "#"
+            return v[0] == "@"
+        args = tuple(eval_term(c, env) for c in e.children)
+        return model.relation(v, len(args)).holds(args) if args else model.proposition(v)
+
+    def eval_term(e, env):
+        if not e.children:
+            return env[e.value] if e.value in env else model.constant(e.value)
+        args = tuple(eval_term(c, env) for c in e.children)
+        return model.function(e.value, len(args)).apply(args)
+
+    return eval_expr(expr, {})
+
+def count_env_copies(fn):
+    copies = 0
+    def profile(frame, event, arg):
+        nonlocal copies
+        if event == "c_call" and arg.__name__ == "copy":
+            copies += 1
+    sys.setprofile(profile)
+    try:
+        fn()
+    finally:
+        sys.setprofile(None)
+    return copies
+
+def bench_scoped_environment():
+    q4 = load_script("A", 4)
+    model = q4.Model.from_json(random_model_json(40))
+    # Valid formulas, so every quantifier runs over the whole domain
+    exprs = [q4.parse_prefix_string(f) for f in [
+        "@x(@y(@z(|(!(R(x,y)),|(R(x,y),P(f(y,z)))))))",
+        "@x(@y(#z(|(=(f(x,y),z),P(s(z))))))",
+    ]]
+
+    copying = lambda: [copying_evaluate(q4, model, e) for e in exprs]
+    walk = lambda: [q4.evaluate_expression(model, e) for e in exprs]
+    compiled = lambda: [q4.evaluate_compiled(model, e) for e in exprs]
+    copying_time, expected = timed(copying)
+    assert timed(walk)[1] == expected and timed(compiled)[1] == expected, "evaluators disagree"
+
+    for name, fn in [("copying", copying), ("walk", walk), ("compiled", compiled)]:
+        print(f"  {name}: {count_env_copies(fn) / len(exprs):.0f} environment copies per formula")
+    report("copying walker vs in-place walker", copying_time, timed(walk)[0])
+    report("copying walker vs in-place compiled", copying_time, timed(compiled)[0])
+
+def run_script(part, question, stdin, *args):
+    script = ROOT / "Submissions" / part / f"q{question}.py"
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, str(script), *args], input=stdin,
+                            capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stdout
+
+def bench_batch_pool():
+    jobs = os.cpu_count() or 1
+    stdin = "\n".join([random_model_json(30), *random_formulas(2000, 5), "done"]) + "\n"
+    sequential_time, expected = run_script("A", 4, stdin)
+    pool_time, actual = run_script("A", 4, stdin, "--jobs", str(max(jobs, 2)))
+    assert expected == actual, "batch mode changed the output"
+    report(f"2000 formulas, 1 process vs {max(jobs, 2)} workers on {jobs} cores", sequential_time, pool_time)
+
+def bench_memoisation():
+    q4 = load_script("A", 4)
+    model = q4.Model.from_json(random_model_json(40))
+    model.memo = q4.SubformulaCache(1 * 2**20)
+    # The inner quantified subformulas depend on x only, not on y or z
+    exprs = [q4.nnf_simplify(q4.parse_prefix_string(f)) for f in [
+        "@x(@y(@z(|(@w(|(!(R(x,w)),P(w))),|(R(y,z),!(R(y,z)))))))",
+        "@x(@y(|(#w(&(R(x,w),P(f(w,x)))),!(P(x)))))",
+    ]]
+
+    compiled = lambda: [q4.evaluate_compiled(model, e) for e in exprs]
+    memoised = lambda: [q4.evaluate_memoised(model, e) for e in exprs]
+    compiled_time, expected = timed(compiled, repeat=1)
+    memo_time, actual = timed(memoised, repeat=1)
+    assert expected == actual, "memoised evaluation disagrees with the compiled evaluator"
+    memo = model.memo
+    print(f"  {memo.hits} hits, {memo.misses} misses, {len(memo.entries)}/{memo.capacity} entries")
+    report("compiled vs memoised", compiled_time, memo_time)
+
+def bench_miniscoping():
+    q4 = load_script("A", 4)
+    model = q4.Model.from_json(random_model_json(50))
+    formulas = [
+        "@x(@y(@z(&(&(|(P(x),!(P(x))),|(P(s(y)),!(P(s(y))))),|(R(z,z),!(R(z,z)))))))",
+        "#x(#y(#z(|(|(&(P(x),!(P(x))),=(s(y),0)),&(R(z,0),P(z))))))",
+    ]
+    plain = [q4.nnf_simplify(q4.parse_prefix_string(f)) for f in formulas]
+    scoped = [q4.miniscope(q4.nnf_simplify(q4.parse_prefix_string(f))) for f in formulas]
+
+    before_time, expected = timed(lambda: [q4.evaluate_compiled(model, e) for e in plain], repeat=1)
+    after_time, actual = timed(lambda: [q4.evaluate_compiled(model, e) for e in scoped], repeat=1)
+    assert expected == actual, "miniscoping changed a result"
+    report("nested quantifiers vs miniscoped", before_time, after_time)
+
+def bench_streaming_io():
+    formulas = random_formulas(20000, 4, seed=1)
+    stdin = "\n".join(formulas) + "\n"
+    for question in [1, 2, 3]:
+        single_time = sum(run_script("A", question, f + "\n")[0] for f in formulas[:20]) / 20
+        stream_time, _ = run_script("A", question, stdin, "--stream")
+        print(f"  q{question}: {1 / single_time:,.0f} lines/sec one per process -> "
+              f"{len(formulas) / stream_time:,.0f} lines/sec streamed")
+
+    model_stdin = "\n".join([random_model_json(4), *formulas, "done"]) + "\n"
+    line_time, expected = run_script("A", 4, model_stdin)
+    stream_time, actual = run_script("A", 4, model_stdin, "--stream")
+    assert expected == actual, "streaming changed q4's output"
+    print(f"  q4: {len(formulas) / line_time:,.0f} lines/sec with input()/print() -> "
+          f"{len(formulas) / stream_time:,.0f} lines/sec streamed")
+
+def left_deep_conjunction(count):
+    # The shape Part B's build_conjunction emits: &(&(&(a,b),c),...)
+    atoms = [f"@x(@y(>(&(Q[{i % 7}](x),C(x,y)),S[{i % 5}](s(x),y))))" for i in range(count)]
+    return "&(" * (count - 1) + atoms[0] + "".join(f",{atom})" for atom in atoms[1:])
+
+def bench_prefix_parser():
+    q4 = load_script("A", 4)
+    for count in [1000, 10000, 100000]:
+        formula = left_deep_conjunction(count)
+        parse_time, tree = timed(q4.parse_prefix_string, formula, repeat=1)
+        print(f"  nesting depth {count - 1:>6}: {parse_time * 1000:8.1f} ms, "
+              f"{len(formula) / parse_time / 2**20:.1f} MiB/s")
+
+def bench_well_formed_scaling():
+    q1 = load_script("A", 1)
+    previous = None
+    for depth in [1000, 10000, 100000]:
+        formula = "!(" * depth + "&(" * depth + "P(f(x))" + ",=(x,0))" * depth + ")" * depth
+        check_time, result = timed(q1.check_well_formed, formula, repeat=1)
+        assert result == "Formula", f"depth {depth} classified as {result}"
+        growth = f" ({check_time / previous:.1f}x for 10x depth)" if previous else ""
+        print(f"  nesting depth {2 * depth:>6}: {check_time * 1000:8.1f} ms{growth}")
+        previous = check_time
+
+def bench_tokenizer():
+    q1 = load_script("A", 1)
+    formula = left_deep_conjunction(5000).replace("[", "").replace("]", "")
+    parser = q1.Parser("")
+    scan_time, (tokens, kinds) = timed(parser.tokenize, formula)
+    loop_time, (loop_tokens, loop_kinds) = timed(parser.tokenize_unicode, formula)
+    assert (tokens, kinds) == (loop_tokens, loop_kinds), "scanners disagree"
+    print(f"  {len(tokens):,} tokens")
+    report("character loop vs compiled scanner", loop_time, scan_time)
+
+class PlainNode:
+    # The node layout before __slots__: a __dict__ and a child list per node
+    def __init__(self, value, children, parent):
+        self.value = value
+        self.children = children
+        self.parent = parent
+
+def plain_copy(tree):
+    root = PlainNode(tree.value, [], None)
+    stack = [(tree, root)]
+    while stack:
+        node, copy = stack.pop()
+        for child in node.children:
+            child_copy = PlainNode(child.value, [], copy)
+            copy.children.append(child_copy)
+            stack.append((child, child_copy))
+    return root
+
+def count_nodes(tree):
+    count, stack = 0, [tree]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+def traced_bytes(fn, *args):
+    tracemalloc.start()
+    result = fn(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+def bench_compact_tree():
+    q4 = load_script("A", 4)
+    formula = left_deep_conjunction(72000)
+    tree_bytes, tree = traced_bytes(q4.parse_prefix_string, formula)
+    nodes = count_nodes(tree)
+    plain_bytes, plain = traced_bytes(plain_copy, tree)
+    print(f"  {nodes:,} nodes: {plain_bytes / nodes:.0f} -> {tree_bytes / nodes:.0f} bytes/node")
+    del plain
+    collect_time, _ = timed(gc.collect)
+    print(f"  full collection with the tree alive: {collect_time * 1000:.1f} ms")
+    del tree
+    gc.collect()
+    unpaused_time, tree = timed(q4.parse_nodes, formula, repeat=1)
+    del tree
+    gc.collect()
+    paused_time, tree = timed(q4.parse_prefix_string, formula, repeat=1)
+    report("parse with the collector running vs paused", unpaused_time, paused_time)
+
+def random_machine_json(states, symbols, seed=0):
+    # States 1 and 2 accept and reject, every other state reads every symbol
+    rng = random.Random(seed)
+    transitions = [
+        [q, a, rng.randrange(states), rng.randrange(symbols), rng.choice([-1, 1])]
+        for q in range(states) if q not in [1, 2] for a in range(symbols)
+    ]
+    return json.dumps({
+        "states": list(range(states)), "alphabet": list(range(symbols)),
+        "transitions": transitions, "initial_state": 0, "accept_state": 1, "reject_state": 2,
+    })
+
+def machine_model_json(machine_json, size, seed=0):
+    # A random structure over the vocabulary of Part B's phi_M
+    rng = random.Random(seed)
+    machine = json.loads(machine_json)
+    domain = [str(i) for i in range(size)]
+    pairs = [f"{a},{b}" for a in domain for b in domain]
+    interpretations = {
+        "s": { d: domain[min(i + 1, size - 1)] for i, d in enumerate(domain) },
+        "C": [p for p in pairs if rng.random() < 0.3],
+        "0": "0",
+    }
+    # phi_M names states and symbols by their value in some places and by index in others
+    for q in sorted(set(machine["states"]) | set(range(len(machine["states"])))):
+        interpretations[f"Q[{q}]"] = [d for d in domain if rng.random() < 0.5]
+    for a in sorted(set(machine["alphabet"]) | set(range(len(machine["alphabet"])))):
+        interpretations[f"S[{a}]"] = [p for p in pairs if rng.random() < 0.5]
+    return json.dumps({ "domain": domain, "interpretations": interpretations })
+
+def bench_shared_subformulas():
+    q4 = load_script("A", 4)
+    sys.setrecursionlimit(100000)
+    machine = random_machine_json(12, 24)
+    _, phi = run_script("B", 7, machine + "\n")
+    phi = phi.strip()
+    model = q4.Model.from_json(machine_model_json(machine, 4))
+
+    def tree_pipeline():
+        expr = q4.nnf_simplify(q4.parse_prefix_string(phi))
+        model.compiled.clear()
+        return q4.evaluate_compiled(model, expr), expr
+
+    def shared_pipeline():
+        shared = q4.SharedNodes()
+        expr = q4.nnf_shared(q4.parse_shared(phi, shared), shared)
+        model.compiled.clear()
+        return q4.evaluate_compiled(model, expr), shared
+
+    tree_time, (expected, tree) = timed(tree_pipeline)
+    shared_time, (actual, shared) = timed(shared_pipeline)
+    assert expected == actual, "sharing changed the result"
+    print(f"  phi_M of {len(phi):,} characters: {count_nodes(tree):,} tree nodes -> {len(shared):,} shared nodes")
+    report("parse + nnf + compiled evaluation", tree_time, shared_time)
+
+    # A repeated formula is a compile cache hit, keyed by printing the DAG or by its hash-cons id
+    expr = q4.nnf_shared(q4.parse_shared(phi, shared), shared)
+    q4.evaluate_compiled(model, expr)
+    printed_time, _ = timed(expr.as_prefix_str)
+    cached_time, _ = timed(q4.compile_cached, model, expr)
+    report("compile cache hit, printing the key vs the hash-cons id", printed_time, cached_time)
+
+def concatenated_prefix(e):
+    # The recursive result += serialiser the iterative one replaced
+    result = e.value
+    if e.children:
+        result += "("
+        for child in e.children[:-1]:
+            result += concatenated_prefix(child) + ","
+        result += concatenated_prefix(e.children[-1]) + ")"
+    return result
+
+def bench_serializers():
+    q4 = load_script("A", 4)
+    sys.setrecursionlimit(100000)
+    for count in [1000, 10000, 50000]:
+        tree = q4.parse_prefix_string(left_deep_conjunction(count))
+        concat_time, expected = timed(concatenated_prefix, tree, repeat=1)
+        join_time, actual = timed(tree.as_prefix_str, repeat=1)
+        assert expected == actual, "serialisers disagree"
+        report(f"nesting depth {count - 1:>5}, {len(actual) / 2**10:,.0f} KiB", concat_time, join_time)
+    with open(os.devnull, "w") as out:
+        stream_time, _ = timed(out.writelines, tree.iter_prefix(), repeat=1)
+        tracemalloc.start()
+        out.writelines(tree.iter_prefix())
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    print(f"  streamed to a file: {len(actual) / stream_time / 2**20:.1f} MiB/s, "
+          f"{peak / 2**10:,.0f} KiB peak for {len(actual) / 2**10:,.0f} KiB of output")
+
+def bench_nnf_scaling():
+    q3 = load_script("A", 3)
+    previous = None
+    for depth in [1000, 10000, 100000]:
+        # Alternating negations and implications, the worst case for re-simplifying
+        formula = "!(>(" * depth + "P(x)" + ",Q(x)))" * depth
+        tree = q3.parse_prefix_string(formula)
+        nnf_time, result = timed(q3.nnf_simplify, tree, repeat=1)
+        growth = f" ({nnf_time / previous:.1f}x for 10x depth)" if previous else ""
+        print(f"  nesting depth {2 * depth:>6}: {nnf_time * 1000:8.1f} ms{growth}")
+        previous = nnf_time
+
+def regex_signature(e, signature):
+    # The recursive walk with up to three regex matches per node that the cache replaced
+    if re.fullmatch(r"^[a-z]+(\[\d+\])?$", e.value):
+        signature["functions" if e.children else "variables"].add(e.value)
+    elif re.fullmatch(r"^(?<!\[)[0-9]+(?!\[)$", e.value):
+        signature["constants"].add(e.value)
+    elif re.fullmatch(r"^[A-Z]+(\[\d+\])?$", e.value):
+        signature["predicates"].add(e.value)
+    for child in e.children:
+        regex_signature(child, signature)
+
+def bench_signature():
+    q2 = load_script("A", 2)
+    sys.setrecursionlimit(100000)
+    _, phi = run_script("B", 7, random_machine_json(30, 40) + "\n")
+    tree = q2.parse_prefix_string(phi.strip())
+    def signature_of(walk):
+        signature = { "predicates": set(), "functions": set(), "constants": set(), "variables": set() }
+        walk(tree, signature)
+        return signature
+
+    regex_time, expected = timed(signature_of, regex_signature)
+    cached_time, actual = timed(signature_of, q2.get_expression_signature_and_variables)
+    assert expected == actual, "signatures disagree"
+    print(f"  phi_M with {count_nodes(tree):,} nodes, {sum(map(len, actual.values()))} distinct symbols")
+    report("regex walk vs classification cache", regex_time, cached_time)
+    # Once the subtree's signature attribute is cached, extraction does not walk at all
+    fill_time, _ = timed(tree.analysis, "signature", q2.subtree_signature, repeat=1)
+    query_time, actual = timed(signature_of, q2.get_expression_signature_and_variables)
+    assert expected == actual, "cached signature disagrees"
+    print(f"  caching every node's signature: {fill_time * 1000:.1f} ms, then {query_time * 1000:.3f} ms per query")
+
+def bench_machine_pipeline():
+    q4 = load_script("A", 4)
+    q7 = load_script("B", 7)
+    sys.setrecursionlimit(100000)
+    for states, symbols in [(8, 8), (30, 40)]:
+        machine = random_machine_json(states, symbols)
+        model = q4.Model.from_json(machine_model_json(machine, 4))
+
+        def string_path():
+            expr = q4.nnf_simplify(q4.parse_prefix_string(q7.phi_M(json.loads(machine))))
+            return q4.compile_expression(model, expr, None, {})(model.bind({}))
+
+        def tree_path():
+            return q4.evaluate_machine_formula(model, q4.TuringMachine.from_json(machine))
+
+        string_time, expected = timed(string_path, repeat=1)
+        tree_time, actual = timed(tree_path, repeat=1)
+        assert expected == actual, "the tree-built phi_M evaluated differently"
+        transitions = len(json.loads(machine)["transitions"])
+        report(f"{transitions:>4} transitions, phi_M text + reparse vs shared tree", string_time, tree_time)
+
+def quadratic_fold(connective, formulas):
+    # The fold the Part B scripts used before, copying the whole prefix every step
+    result = formulas[0]
+    for formula in formulas[1:]:
+        result = f"{connective}({result},{formula})"
+    return result
+
+def traced_peak(fn, *args):
+    tracemalloc.start()
+    result = fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, result
+
+def bench_streaming_machine():
+    q7 = load_script("B", 7)
+    for states, symbols in [(40, 10), (120, 20)]:
+        tm = json.loads(random_machine_json(states, symbols))
+        transitions = len(tm["transitions"])
+        pieces = [q7.phi_transitions({ **tm, "transitions": [t] }) for t in tm["transitions"]]
+
+        def quadratic():
+            return len(quadratic_fold("&", pieces))
+
+        def joined():
+            return len(q7.phi_transitions(tm))
+
+        def streamed():
+            # Counted instead of written, standing in for stdout
+            return sum(map(len, q7.phi_M_pieces(tm)))
+
+        quadratic_time, expected = timed(quadratic, repeat=1)
+        joined_time, actual = timed(joined)
+        assert expected == actual, "the linear fold disagrees"
+        report(f"{transitions:>4} transitions, quadratic vs linear fold of phi_transitions", quadratic_time, joined_time)
+        whole_peak, whole = traced_peak(lambda: len(q7.phi_M(tm)))
+        stream_peak, streamed_size = traced_peak(streamed)
+        assert whole == streamed_size, "the streamed phi_M has a different length"
+        print(f"  phi_M of {whole / 1e6:.1f} MB: peak {whole_peak / 1e6:.1f} MB joined -> {stream_peak / 1e6:.3f} MB streamed")
+
+def connective_depth(tree):
+    deepest, stack = 0, [(tree, 0)]
+    while stack:
+        node, depth = stack.pop()
+        deepest = max(deepest, depth)
+        stack.extend((child, depth + (node.value in ["&", "|"])) for child in node.children)
+    return deepest
+
+def bench_balanced_layout():
+    q4 = load_script("A", 4)
+    q7 = load_script("B", 7)
+    default_limit = sys.getrecursionlimit()
+    for states, symbols in [(20, 20), (30, 30)]:
+        machine = random_machine_json(states, symbols)
+        tm = json.loads(machine)
+        model = q4.Model.from_json(machine_model_json(machine, 4))
+        results, times, depths, fits = [], [], [], []
+        for balanced in [False, True]:
+            q7.balanced = balanced
+            formula = q7.phi_M(tm)
+
+            def pipeline():
+                expr = q4.nnf_simplify(q4.parse_prefix_string(formula))
+                return expr, q4.compile_expression(model, expr, None, {})(model.bind({}))
+
+            sys.setrecursionlimit(default_limit)
+            try:
+                pipeline()
+                fits.append("fits")
+            except RecursionError:
+                fits.append("overflows")
+            sys.setrecursionlimit(100000)
+            elapsed, (expr, result) = timed(pipeline, repeat=1)
+            results.append(result)
+            times.append(elapsed)
+            depths.append(connective_depth(expr))
+        q7.balanced = False
+        sys.setrecursionlimit(default_limit)
+        assert results[0] == results[1], "the balanced phi_M evaluated differently"
+        report(f"{len(tm['transitions']):>4} transitions, parse + NNF + eval left-deep vs balanced", *times)
+        print(f"  &/| nesting depth: {depths[0]} -> {depths[1]}, "
+              f"the default recursion limit of {default_limit}: {fits[0]} -> {fits[1]}")
+
+def bench_exactly_one():
+    q4 = load_script("A", 4)
+    q2 = load_script("B", 2)
+    sys.setrecursionlimit(100000)
+    for states in [50, 200, 500]:
+        tm = { "states": list(range(states)) }
+        # Every element is in exactly one state, so no encoding can stop early
+        domain = [str(i) for i in range(4)]
+        model = q4.Model.from_json(json.dumps({ "domain": domain, "interpretations": {
+            f"Q[{q}]": [d for d in domain if int(d) % states == q] for q in range(states)
+        } }))
+        sizes, times = {}, {}
+        for encoding in ["pairwise", "bisection", "ladder"]:
+            q2.exactly_one = encoding
+
+            def pipeline():
+                formula = q2.phi_Q(tm)
+                expr = q4.nnf_simplify(q4.parse_prefix_string(formula))
+                return formula, q4.compile_expression(model, expr, None, {})(model.bind({}))
+
+            times[encoding], (formula, result) = timed(pipeline, repeat=1)
+            sizes[encoding] = len(formula)
+            # The ladder's counters are not interpreted, so only the equivalent encodings must hold
+            assert result or encoding == "ladder", f"{encoding} rejected a model with exactly one state"
+        q2.exactly_one = "pairwise"
+        print(f"  {states} states, phi_Q characters: " + ", ".join(f"{name} {size:,}" for name, size in sizes.items()))
+        for encoding in ["bisection", "ladder"]:
+            report(f"{states} states, build + parse + NNF + eval pairwise vs {encoding}", times["pairwise"], times[encoding])
+
+def bench_factored_frame():
+    q4 = load_script("A", 4)
+    q7 = load_script("B", 7)
+    sys.setrecursionlimit(100000)
+    for states, symbols in [(10, 10), (30, 40)]:
+        machine = random_machine_json(states, symbols)
+        tm = json.loads(machine)
+        model = q4.Model.from_json(machine_model_json(machine, 4))
+        sizes, times, results = [], [], []
+        for factored in [False, True]:
+            q7.factored_frame = factored
+
+            def pipeline():
+                formula = q7.phi_M(tm)
+                expr = q4.nnf_simplify(q4.parse_prefix_string(formula))
+                return formula, q4.compile_expression(model, expr, None, {})(model.bind({}))
+
+            elapsed, (formula, result) = timed(pipeline, repeat=1)
+            sizes.append(len(formula))
+            times.append(elapsed)
+            results.append(result)
+        q7.factored_frame = False
+        assert results[0] == results[1], "the factored frame evaluated differently"
+        report(f"{len(tm['transitions']):>4} transitions, build + parse + NNF + eval per-transition vs factored frame", *times)
+        print(f"  phi_M characters: {sizes[0]:,} -> {sizes[1]:,}")
+
+# A binary counter behind the end-of-tape mark: it never halts, and walks
+# back and forth over a slowly growing number
+COUNTER_MACHINE = json.dumps({
+    "states": [0, 1, 2, 3],
+    "alphabet": [0, 1, 2, 3],
+    "transitions": [[0, 3, 0, 2, 1], [0, 2, 3, 3, -1], [0, 0, 3, 3, -1], [3, 2, 3, 2, -1], [3, 3, 3, 3, -1], [3, 1, 0, 1, 1]],
+    "initial_state": 0,
+    "accept_state": 1,
+    "reject_state": 2,
+})
+
+def dict_tape_run(tm, budget):
+    # One dict lookup per step on a dict tape, the way a machine is usually first written
+    moves = { (t[0], t[1]): (t[2], t[3], t[4]) for t in tm["transitions"] }
+    tape, state, head = { 0: 1 }, tm["initial_state"], 1
+    for _ in range(budget):
+        move = moves.get((state, tape.get(head, 0)))
+        if move is None:
+            break
+        state, tape[head], direction = move
+        head = max(0, head + direction)
+    return state, head
+
+def bench_simulator():
+    q4 = load_script("A", 4)
+    for name, machine_json in [("counter", COUNTER_MACHINE), ("sample1", (ROOT / "Submissions" / "B" / "Assignment2PartB" / "sample1_input.txt").read_text())]:
+        tm = json.loads(machine_json)
+        machine = q4.TuringMachine.from_json(machine_json)
+        budget = 2_000_000
+        dict_time, expected = timed(dict_tape_run, tm, budget, repeat=1)
+        table_time, run = timed(machine.run, budget, repeat=1)
+        assert expected == (run.state, run.head), "the simulators disagree"
+        report(f"{name}, {budget:,} steps on a dict tape vs the dense table", dict_time, table_time)
+        print(f"  {budget / table_time / 1e6:.1f}M steps per second, {len(run.tape):,} tape cells")
+
+def bench_history_model():
+    q4 = load_script("A", 4)
+    q7 = load_script("B", 7)
+    sys.setrecursionlimit(100000)
+    machine = q4.TuringMachine.from_json(COUNTER_MACHINE)
+    for steps in [100, 300]:
+        history = machine.trace(steps)
+        json_time, _ = timed(lambda: q4.Model.from_json(q4.history_model_json(machine, history)), repeat=1)
+        array_time, _ = timed(q4.history_model, machine, history)
+        report(f"{steps:>6} steps, history model through JSON vs from the arrays", json_time, array_time)
+    for steps in [10_000, 100_000]:
+        build_time, _ = timed(lambda: q4.history_model(machine, machine.trace(steps)), repeat=1)
+        size, _ = traced_bytes(lambda: q4.history_model(machine, machine.trace(steps)))
+        print(f"  {steps:>6} steps: built in {build_time * 1000:.1f} ms, {size / 1e6:.1f} MB for {(steps + 2) ** 2:,} tape pairs")
+    # The parts are timed on their own because phi_epsilon is false on this machine's
+    # history, which would end a check of phi_M early. phi_transitions comes out F:
+    # the counter never halts, and the last time is its own successor under s, so the
+    # step the machine would take there cannot show up at s(t) = t
+    tm = json.loads(COUNTER_MACHINE)
+    for steps in [50, 150]:
+        model = q4.history_model(machine, machine.trace(steps))
+        for name, part in [("phi_delta", q7.phi_delta), ("phi_transitions", q7.phi_transitions)]:
+            expr = q4.nnf_simplify(q4.parse_prefix_string(part(tm)))
+            check_time, value = timed(lambda: q4.compile_expression(model, expr, None, {})(model.bind({})), repeat=1)
+            print(f"  {steps:>6} steps: {name} checked in {check_time * 1000:.1f} ms ({'T' if value else 'F'})")
+
+BENCHMARKS = {
+    "compiled": bench_compiled_evaluator,
+    "numpy": bench_numpy_evaluator,
+    "interned": bench_interned_model,
+    "environment": bench_scoped_environment,
+    "batch": bench_batch_pool,
+    "memo": bench_memoisation,
+    "miniscope": bench_miniscoping,
+    "streaming": bench_streaming_io,
+    "parser": bench_prefix_parser,
+    "well-formed": bench_well_formed_scaling,
+    "tokenizer": bench_tokenizer,
+    "compact-tree": bench_compact_tree,
+    "shared": bench_shared_subformulas,
+    "serializers": bench_serializers,
+    "nnf": bench_nnf_scaling,
+    "signature": bench_signature,
+    "machine": bench_machine_pipeline,
+    "streaming-machine": bench_streaming_machine,
+    "balanced": bench_balanced_layout,
+    "exactly-one": bench_exactly_one,
+    "frame": bench_factored_frame,
+    "simulator": bench_simulator,
+    "history": bench_history_model,
+}
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    # Several benchmarks raise the recursion limit, and balanced compares against the default
+    default_limit = sys.getrecursionlimit()
+    for name in names:
+        print(f"\n{YELLOW}=== Benchmark {name} ==={ENDC}")
+        try:
+            BENCHMARKS[name]()
+        finally:
+            sys.setrecursionlimit(default_limit)
+
+if __name__ == "__main__":
+    main()
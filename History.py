@@ -0,0 +1,71 @@
+import argparse
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+
+def load_script(part, question):
+    # The submissions are standalone scripts, so load them by path
+    path = ROOT / "Submissions" / part / f"q{question}.py"
+    spec = importlib.util.spec_from_file_location(f"{part.lower()}_q{question}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def check_history(q4, q7, tm, steps, model_path=None):
+    """
+        Run the machine for at most steps steps, build the history model and
+        evaluate each part of B/q7's phi_M on it. Yields (name, value) lines,
+        with the conjunction of phi_M's premises on its own line before phi_M.
+    """
+    machine = q4.TuringMachine.from_json(json.dumps(tm))
+    history = machine.trace(steps)
+    yield "steps", history.steps
+    yield "halted", history.halted
+    if model_path is not None:
+        Path(model_path).write_text(q4.history_model_json(machine, history))
+    model = q4.history_model(machine, history)
+    premises = [
+        ("phi_epsilon", q7.phi_epsilon),
+        ("phi_Q", q7.phi_Q),
+        ("phi_delta", q7.phi_delta),
+        ("phi_C", q7.phi_C),
+        ("phi_transitions", q7.phi_transitions),
+    ]
+    values = {}
+    for name, formula in premises + [("phi_halt", q7.phi_halt), ("phi_M", q7.phi_M)]:
+        if name == "phi_M":
+            # phi_M is premises > phi_halt, so it says nothing about the run when a premise fails
+            values["premises"] = all(values[premise] for premise, _ in premises)
+            yield "premises", "T" if values["premises"] else "F"
+        expr = q4.nnf_simplify(q4.parse_prefix_string(formula(tm)))
+        values[name] = q4.compile_expression(model, expr, None, {})(model.bind({}))
+        yield name, "T" if values[name] else "F"
+
+def main():
+    parser = argparse.ArgumentParser(description="Check B/q7.py's phi_M against a bounded run of the machine on stdin")
+    parser.add_argument("steps", type=int, help="step bound k; the model has the times 0..k")
+    parser.add_argument("--model", help="also write the history model as JSON to this path")
+    parser.add_argument("--balanced", action="store_true", help="B/q7.py's --balanced")
+    parser.add_argument("--exactly-one", choices=["pairwise", "bisection", "ladder"], default="pairwise", help="B/q7.py's --exactly-one")
+    parser.add_argument("--factored-frame", action="store_true", help="B/q7.py's --factored-frame")
+    args = parser.parse_args()
+
+    q4 = load_script("A", 4)
+    q7 = load_script("B", 7)
+    q7.balanced = args.balanced
+    q7.exactly_one = args.exactly_one
+    q7.factored_frame = args.factored_frame
+    # The compiled evaluator recurses through phi_M's left-deep chains
+    sys.setrecursionlimit(100000)
+
+    tm = json.loads(sys.stdin.read())
+    for name, value in check_history(q4, q7, tm, args.steps, args.model):
+        print(f"{name}: {value}")
+        if name == "premises" and value == "F":
+            print("warning: the premises of phi_M are false on this run, so phi_M holds vacuously", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
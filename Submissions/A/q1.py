@@ -1,11 +1,65 @@
 import re
+import sys
+import argparse
+
+# Token kinds
+QUANTIFIER, NEGATION, BINARY, OPEN, CLOSE, COMMA, PREDICATE, VARIABLE, NAME, CONSTANT, OTHER, INVALID = range(1, 13)
+
+# One alternative per kind, tried in order. Identifiers are classified as a whole:
+# the lookaheads stop a predicate/name match from ending inside a longer identifier.
+TOKEN_PATTERN = re.compile(r"""
+    (?P<quantifier>[@\#])
+  | (?P<negation>!)
+  | (?P<binary>[&|>=])
+  | (?P<open>\()
+  | (?P<close>\))
+  | (?P<comma>,)
+  | (?P<bracket>[\[\]])
+  | (?P<predicate>[A-Z][A-Z0-9]*(?![A-Za-z0-9_]))
+  | (?P<variable>[a-z](?![A-Za-z0-9_]))
+  | (?P<name>[a-z][a-z0-9]*(?![A-Za-z0-9_]))
+  | (?P<identifier>[A-Za-z][A-Za-z0-9_]*)
+  | (?P<constant>[0-9]+)
+  | (?P<invalid>.)
+""", re.VERBOSE | re.DOTALL)
+GROUP_KINDS = {
+    "quantifier": QUANTIFIER, "negation": NEGATION, "binary": BINARY,
+    "open": OPEN, "close": CLOSE, "comma": COMMA, "bracket": OTHER,
+    "predicate": PREDICATE, "variable": VARIABLE, "name": NAME,
+    "identifier": OTHER, "constant": CONSTANT, "invalid": INVALID,
+}
+# Indexed by match.lastindex
+INDEX_KINDS = [None] + [GROUP_KINDS[name] for name, _ in sorted(TOKEN_PATTERN.groupindex.items(), key=lambda item: item[1])]
+
+# Splits ASCII input into the same tokens as the character loop, without classifying them
+TOKEN_SPLIT = re.compile(r"[A-Za-z][A-Za-z0-9_]*|[0-9]+|.", re.DOTALL)
+
+# Formulas reuse a handful of distinct tokens, so each is classified once
+token_kinds: dict[str, int] = {}
+
+def classify(token: str) -> int:
+    kind = INDEX_KINDS[TOKEN_PATTERN.fullmatch(token).lastindex]
+    if len(token_kinds) < 1 << 16:
+        token_kinds[token] = kind
+    return kind
 
 class Parser:
     def __init__(self, input_str):
-        self.tokens = self.tokenize(input_str.replace(" ", ""))
+        self.tokens, self.kinds = self.tokenize(input_str.replace(" ", ""))
         self.pos = 0
 
     def tokenize(self, s):
+        if not s.isascii():
+            return self.tokenize_unicode(s)
+        tokens = TOKEN_SPLIT.findall(s)
+        kinds = [token_kinds.get(token) or classify(token) for token in tokens]
+        if INVALID in kinds:
+            return [], []
+        return tokens, kinds
+
+    def tokenize_unicode(self, s):
+        # str.isalpha/isdigit accept far more than ASCII, e.g. "²" is a digit,
+        # which no regex class matches exactly, so scan such input by character
         tokens = []
         i = 0
         while i < len(s):
@@ -25,159 +79,118 @@ class Parser:
                 tokens.append(s[i:j])
                 i = j
             else:
-                return []  
-        return tokens
+                return [], []
+        kinds = []
+        for token in tokens:
+            if token.isascii():
+                kinds.append(token_kinds.get(token) or classify(token))
+            else:
+                kinds.append(CONSTANT if token.isdigit() else OTHER)
+        return tokens, kinds
+
+    # LL(1) decision table: (nonterminal, next token kind) -> production.
+    # A formula and a term never start with the same kind of token, so an
+    # argument ("arg") is decided by its first token and nothing is re-parsed.
+    FORMULA_FIRST = [QUANTIFIER, NEGATION, BINARY, OPEN, PREDICATE]
+    TERM_FIRST = [CONSTANT, NAME, VARIABLE]
+    TABLE = {
+        "formula": {
+            QUANTIFIER: [QUANTIFIER, VARIABLE, OPEN, "formula", CLOSE],
+            NEGATION: [NEGATION, OPEN, "formula", CLOSE],
+            BINARY: [BINARY, OPEN, "arg", COMMA, "arg", CLOSE],
+            OPEN: [OPEN, "formula", CLOSE],
+            PREDICATE: [PREDICATE, "args"],
+        },
+        "term": {
+            CONSTANT: [CONSTANT],
+            NAME: [NAME, "args"],
+            VARIABLE: [VARIABLE, "args"],
+        },
+        "arg": {
+            **{ kind: ["formula"] for kind in FORMULA_FIRST },
+            **{ kind: ["term"] for kind in TERM_FIRST },
+        },
+        # Without an opening bracket there are no arguments
+        "args": { OPEN: [OPEN, "arglist"] },
+        "arglist": {
+            CLOSE: [CLOSE],
+            **{ kind: ["arg", "more"] for kind in FORMULA_FIRST + TERM_FIRST },
+        },
+        "more": {
+            COMMA: [COMMA, "arg", "more"],
+            CLOSE: [CLOSE],
+        },
+    }
+    NULLABLE = { "args": [] }
 
     def parse(self):
         if not self.tokens:
             return "None"
-        try:
-            result = self.parse_formula()
-            if result and self.pos == len(self.tokens):
-                return "Formula"
-        except:
-            pass
 
-        self.pos = 0
-        try:
-            result = self.parse_term()
-            if result and self.pos == len(self.tokens):
-                return "Term"
-        except:
-            pass
-
-        return "None"
-
-    def parse_formula(self):
-        if self.pos >= len(self.tokens):
-            return None
-
-        token = self.tokens[self.pos]
-
-        if token in ['@', '#']:
-            self.pos += 1
-            if not self.expect_variable():
-                return None
-            if not self.match('('):
-                return None
-            sub = self.parse_formula()
-            if sub is None or not self.match(')'):
-                return None
-            return ('quantifier', token, sub)
-
-        elif token == '!':
-            self.pos += 1
-            if not self.match('('): return None
-            sub = self.parse_formula()
-            if sub is None or not self.match(')'): return None
-            return ('not', sub)
-
-        elif token in ['&', '|', '>', '=']:
-            self.pos += 1
-            if not self.match('('): return None
-            left = self.parse_formula_or_term()
-            if left is None: return None
-            if not self.match(','): return None
-            right = self.parse_formula_or_term()
-            if right is None: return None
-            if not self.match(')'): return None
-            return ('binary', token, left, right)
-
-        elif token == '(':
-            self.pos += 1
-            sub = self.parse_formula()
-            if sub is None or not self.match(')'):
-                return None
-            return sub
-
-        elif self.is_predicate():
-            name = self.tokens[self.pos]
-            self.pos += 1
-            if self.pos < len(self.tokens) and self.tokens[self.pos] == '(':
-                args = self.parse_args()
-                if args is None:
-                    return None
-                return ('predicate', name, args)
-            else:
-                return ('predicate', name, [])
-
-        elif re.fullmatch(r'^[A-Z]$', token):  
-            self.pos += 1
-            return ('predicate', token, [])
-
-        return None
-
-    def parse_formula_or_term(self):
-        pos_backup = self.pos
-        res = self.parse_formula()
-        if res is not None:
-            return res
-        self.pos = pos_backup
-        return self.parse_term()
-
-    def parse_term(self):
-        if self.pos >= len(self.tokens):
-            return None
-
-        token = self.tokens[self.pos]
-
-        if token.isdigit():
-            self.pos += 1
-            return ('const', token)
-
-        if re.fullmatch(r'^[a-z][a-z0-9]*$', token):
-            name = token
-            self.pos += 1
-            if self.pos < len(self.tokens) and self.tokens[self.pos] == '(':
-                args = self.parse_args()
-                if args is None:
-                    return None
-                return ('func', name, args)
-            else:
-                return ('var', name)
-
-        return None
-
-    def parse_args(self):
-        if not self.match('('):
-            return None
-        args = []
-        if self.match(')'):
-            return args  
-        while True:
-            if self.pos >= len(self.tokens):
-                return None
-            arg = self.parse_formula_or_term()
-            if arg is None:
-                return None
-            args.append(arg)
-            if self.match(','):
-                continue
-            elif self.match(')'):
-                break
-            else:
-                return None
-        return args
-
-    def match(self, symbol):
-        if self.pos < len(self.tokens) and self.tokens[self.pos] == symbol:
-            self.pos += 1
-            return True
-        return False
+        kinds = self.kinds
+        if kinds[0] in self.FORMULA_FIRST:
+            stack, result = ["formula"], "Formula"
+        elif kinds[0] in self.TERM_FIRST:
+            stack, result = ["term"], "Term"
+        else:
+            return "None"
 
-    def expect_variable(self):
-        if self.pos < len(self.tokens) and re.fullmatch(r'^[a-z]$', self.tokens[self.pos]):
-            self.pos += 1
-            return True
-        return False
+        # Predictive parse with an explicit stack: one step per token or production
+        while stack:
+            symbol = stack.pop()
+            kind = kinds[self.pos] if self.pos < len(kinds) else None
+            if symbol in self.TABLE:
+                production = self.TABLE[symbol].get(kind, self.NULLABLE.get(symbol))
+                if production is None:
+                    return "None"
+                stack.extend(reversed(production))
+            elif symbol == kind:
+                self.pos += 1
+            else:
+                return "None"
 
-    def is_predicate(self):
-        return self.pos < len(self.tokens) and re.fullmatch(r'^[A-Z][A-Z0-9]*$', self.tokens[self.pos])
+        return result if self.pos == len(kinds) else "None"
 
 
 def check_well_formed(input_str):
     parser = Parser(input_str)
     return parser.parse()
 
-
-print(check_well_formed(input().strip()))
\ No newline at end of file
+# Streaming mode reads and writes in blocks of this many bytes
+STREAM_BLOCK_SIZE = 1 << 20
+
+def stream_lines(stream=None):
+    """Yield the stripped lines of stdin, read in large blocks rather than one input() per line."""
+    stream = stream or sys.stdin.buffer
+    pending = b""
+    while True:
+        block = stream.read(STREAM_BLOCK_SIZE)
+        if not block:
+            break
+        lines = (pending + block).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.decode().strip()
+    if pending:
+        yield pending.decode().strip()
+
+def stream_writer():
+    """A single block-buffered writer over stdout; flush it once at the end."""
+    sys.stdout.flush()
+    return open(sys.stdout.fileno(), "w", buffering=STREAM_BLOCK_SIZE, closefd=False)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stream", action="store_true", help="classify every line of stdin")
+    args = parser.parse_args()
+
+    if args.stream:
+        out = stream_writer()
+        for line in stream_lines():
+            out.write(check_well_formed(line) + "\n")
+        out.flush()
+    else:
+        print(check_well_formed(input().strip()))
+
+if __name__ == "__main__":
+    main()
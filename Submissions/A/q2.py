@@ -1,4 +1,8 @@
+import gc
 import re
+import sys
+import argparse
+from typing import Any, Callable
 
 class Alphabet:
     equality = "="
@@ -12,15 +16,25 @@ class Alphabet:
     ascend_seperator = ")" # All subexpressions from the descend seperator are a child of current expression
     level_seperator = "," # All expressions have the same parent
 
+# Leaves built here share one empty child tuple until a child is added to them
+NO_CHILDREN = ()
+
 class ExpressionTree:
+    # No per-node __dict__, large formulas allocate millions of these
+    __slots__ = ("value", "children", "parent", "facts")
     value: str
     children: list['ExpressionTree']
     parent: 'ExpressionTree'
+    facts: dict[str, Any] | None
 
     def __init__(self, value: str, children: list['ExpressionTree'], parent: 'ExpressionTree'):
-        self.value = value
+        # Symbols repeat throughout a formula, so every node shares one copy
+        self.value = sys.intern(value)
+        # The caller's list is kept as given, so it sees children added later
         self.children = children
         self.parent = parent
+        # Analysis attributes of the subtree, filled in by analysis()
+        self.facts = None
 
     def equals_expr() -> 'ExpressionTree':
         return ExpressionTree(Alphabet.equality, [None, None], None)
@@ -41,14 +55,65 @@ class ExpressionTree:
         return len(self.children)
 
     def add_child(self, new_expr: 'ExpressionTree'):
+        if self.children is NO_CHILDREN:
+            self.children = []
         self.children.append(new_expr)
         new_expr.parent = self
+        self.invalidate()
 
     # Helper Function
     # Replace Node A with Node B including the subtrees
     def replace(A: 'ExpressionTree', B: 'ExpressionTree'):
         B.parent = A.parent
         A.parent.children[A.parent.children.index(A)] = B
+        A.parent.invalidate()
+
+    # Helper Function
+    # An attribute of the subtree, built bottom up by combine(node, child values).
+    # It is computed without recursion and cached on every node of the subtree;
+    # like parsing, this pauses the cyclic collector while it allocates.
+    def analysis(self, name: str, combine: Callable[['ExpressionTree', list[Any]], Any]) -> Any:
+        if self.facts is not None and name in self.facts:
+            return self.facts[name]
+        # Pre-order over the nodes without the attribute, so reversed it visits children first
+        order = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            for child in node.children:
+                if child.facts is None or name not in child.facts:
+                    stack.append(child)
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for node in reversed(order):
+                if node.facts is None:
+                    node.facts = {}
+                node.facts[name] = combine(node, [child.facts[name] for child in node.children])
+        finally:
+            if collecting:
+                gc.enable()
+        return self.facts[name]
+
+    # Helper Function
+    # Call after changing this node. Anything cached on a node is cached on all
+    # of its descendants too, so clearing stops at the first ancestor with nothing cached.
+    def invalidate(self):
+        node = self
+        while node is not None and node.facts is not None:
+            node.facts = None
+            node = node.parent
+
+    def size(self) -> int:
+        return self.analysis("size", subtree_size)
+
+    def quantifier_depth(self) -> int:
+        return self.analysis("quantifier_depth", subtree_quantifier_depth)
+
+    # Names at the leaves that no quantifier above them binds
+    def free_variables(self) -> frozenset[str]:
+        return self.analysis("free_variables", subtree_free_variables)
 
     # Helper Function
     # Only use left if self was created by _expr() methods
@@ -58,6 +123,7 @@ class ExpressionTree:
     def set_left(self, value: 'ExpressionTree'):
         self.children[0] = value
         value.parent = self
+        self.invalidate()
     left = property(get_left, set_left)
 
     # Helper Function
@@ -68,6 +134,7 @@ class ExpressionTree:
     def set_right(self, value: 'ExpressionTree'):
         self.children[1] = value
         value.parent = self
+        self.invalidate()
     right = property(get_right, set_right)
 
     # Helper Function
@@ -78,105 +145,260 @@ class ExpressionTree:
     def set_child(self, value: 'ExpressionTree'):
         self.children[0] = value
         value.parent = self
+        self.invalidate()
     child = property(get_child, set_child)
 
+    # The serialisers below walk the tree with an explicit stack of nodes and
+    # the literal pieces that follow them, and yield the output piece by piece.
+    # as_*_str joins the pieces once; out.writelines(expr.iter_*()) streams them.
+    def iter_tree(self, depth = 0):
+        stack = [(self, depth)]
+        while stack:
+            node, depth = stack.pop()
+            yield depth * "    " + node.value + "\n"
+            for child in reversed(node.children):
+                stack.append((child, depth + 1))
+
+    def iter_prefix(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if type(node) is str:
+                yield node
+                continue
+            yield node.value
+            if node.children:
+                yield Alphabet.descend_seperator
+                push_arguments(stack, node.children, Alphabet.level_seperator)
+
+    def iter_postfix(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if type(node) is str:
+                yield node
+                continue
+            if node.children:
+                yield Alphabet.descend_seperator
+                stack.append(node.value)
+                push_arguments(stack, node.children, Alphabet.level_seperator + " ")
+            else:
+                yield node.value
+
+    def iter_standard(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if type(node) is str:
+                yield node
+                continue
+            if node.value in [ Alphabet.equality, Alphabet.conjunction, Alphabet.disjunction, Alphabet.implication ]:
+                yield Alphabet.descend_seperator
+                stack.append(Alphabet.ascend_seperator)
+                stack.append(node.right)
+                stack.append(" " + node.value + " ")
+                stack.append(node.left)
+            else:
+                yield node.value
+                if node.children:
+                    yield Alphabet.descend_seperator
+                    push_arguments(stack, node.children, Alphabet.level_seperator + " ")
+
     def as_tree_str(self, depth = 0) -> str:
-        result = depth * "    " +  self.value + "\n"
-        if self.arity() > 0:
-            for child in self.children:
-                result += child.as_tree_str(depth + 1)
-        return result 
+        return "".join(self.iter_tree(depth))
 
     def as_prefix_str(self) -> str:
-        result = self.value
-        if self.arity() > 0:
-            result += Alphabet.descend_seperator
-            for child in self.children[:-1]:
-                result += child.as_prefix_str() + Alphabet.level_seperator
-            result += self.children[-1].as_prefix_str() + Alphabet.ascend_seperator
-        return result 
-        
+        return "".join(self.iter_prefix())
+
     def as_postfix_str(self) -> str:
-        result = ""
-        if self.arity() > 0:
-            result += Alphabet.descend_seperator
-            for child in self.children[:-1]:
-                result += child.as_postfix_str() + Alphabet.level_seperator + " "
-            result += self.children[-1].as_postfix_str() + Alphabet.ascend_seperator
-        result += self.value
-        return result 
+        return "".join(self.iter_postfix())
 
     def as_standard_str(self) -> str:
-        if self.value in [ Alphabet.equality, Alphabet.conjunction, Alphabet.disjunction, Alphabet.implication ]:
-            result = Alphabet.descend_seperator + self.left.as_standard_str()
-            result += " " + self.value + " "
-            result += self.right.as_standard_str() + Alphabet.ascend_seperator
-        else:
-            result = self.value
-            if self.arity() > 0:
-                result += Alphabet.descend_seperator
-                for child in self.children[:-1]:
-                    result += child.as_standard_str() + Alphabet.level_seperator + " "
-                result +=  self.children[-1].as_standard_str() + Alphabet.ascend_seperator
+        return "".join(self.iter_standard())
+
+# Leaf sets are shared, a formula mentions only a few distinct names
+singletons: dict[Any, frozenset] = {}
+
+def singleton(item: Any) -> frozenset:
+    result = singletons.get(item)
+    if result is None:
+        result = frozenset([item])
+        if len(singletons) < 1 << 16:
+            singletons[item] = result
+    return result
+
+def merged(sets: list[frozenset]) -> frozenset:
+    # The largest set is reused when the others add nothing to it, so the
+    # nodes along a long chain share one set instead of holding copies
+    if len(sets) == 1:
+        return sets[0]
+    largest = max(sets, key=len, default=frozenset())
+    for other in sets:
+        if not other <= largest:
+            return largest.union(*sets)
+    return largest
+
+def subtree_size(node: ExpressionTree, sizes: list[int]) -> int:
+    return 1 + sum(sizes)
+
+def subtree_quantifier_depth(node: ExpressionTree, depths: list[int]) -> int:
+    quantifier = node.value.startswith(Alphabet.forall) or node.value.startswith(Alphabet.exists)
+    return max(depths, default=0) + quantifier
+
+def subtree_free_variables(node: ExpressionTree, names: list[frozenset[str]]) -> frozenset[str]:
+    v = node.value
+    if v.startswith(Alphabet.forall) or v.startswith(Alphabet.exists):
+        free = merged(names)
+        return free - { v[1:] } if v[1:] in free else free
+    if not names:
+        return singleton(v)
+    return merged(names)
 
-        return result
+def push_arguments(stack: list, children: list[ExpressionTree], seperator: str):
+    # Pushed in reverse, so they pop as: first child, seperator, ..., last child, ")"
+    stack.append(Alphabet.ascend_seperator)
+    stack.append(children[-1])
+    for child in children[-2::-1]:
+        stack.append(seperator)
+        stack.append(child)
+
+# A node's value runs from after any leading spaces up to the next seperator
+PREFIX_VALUE = re.compile(r" *([^(),]*)")
+PREFIX_SPACES = re.compile(r" *")
 
 def parse_prefix_string(prefix_str: str) -> ExpressionTree:
-    i = 0
+    """
+        Parse with an explicit stack of nodes whose argument lists are still
+        open, so memory does not depend on the nesting depth of the formula.
+        The cyclic collector is paused while the tree is built: every node
+        links to its parent, and rescanning the growing tree would dominate
+        the parse time.
+    """
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        return parse_nodes(prefix_str)
+    finally:
+        if collecting:
+            gc.enable()
 
-    def parse():
-        nonlocal i
-        while i < len(prefix_str) and prefix_str[i] == " ":
-            i += 1
+def parse_nodes(prefix_str: str) -> ExpressionTree:
+    i = 0
+    n = len(prefix_str)
+    open_nodes = []
 
+    while True:
         # Read value
-        start = i
-        while i < len(prefix_str) and prefix_str[i] not in "(),":
+        match = PREFIX_VALUE.match(prefix_str, i)
+        i = match.end()
+        node = ExpressionTree(match.group(1), NO_CHILDREN, None)
+        if open_nodes:
+            open_nodes[-1].add_child(node)
+        else:
+            root = node
+
+        if i < n and prefix_str[i] == '(':
             i += 1
-        value = prefix_str[start:i]
+            open_nodes.append(node)
+            continue
 
-        node = ExpressionTree(value, [], None)
+        # The node is complete, close every argument list that ends here
+        while open_nodes:
+            i = PREFIX_SPACES.match(prefix_str, i).end()
+            if i >= n:
+                return root
+            if prefix_str[i] == ',':
+                i += 1
+                break
+            elif prefix_str[i] == ')':
+                i += 1
+                open_nodes.pop()
+            else:
+                break
+        else:
+            return root
 
-        while i < len(prefix_str) and prefix_str[i] == " ":
-            i += 1
+# Variable: ^[a-z]+(\[\d+\])?$
+LOWERCASE_SYMBOL = re.compile(r"^[a-z]+(\[\d+\])?$")
+# Constant: ^(?<!\[)[0-9]+(?!\[)$
+CONSTANT_SYMBOL = re.compile(r"^(?<!\[)[0-9]+(?!\[)$")
+# Predicate: ^[A-Z]+(\[\d+\])?$
+PREDICATE_SYMBOL = re.compile(r"^[A-Z]+(\[\d+\])?$")
 
-        if i < len(prefix_str) and prefix_str[i] == '(':
-            i += 1
-            while True:
-                child = parse()
-                node.add_child(child)
-                while i < len(prefix_str) and prefix_str[i] == " ":
-                    i += 1
-                if i < len(prefix_str) and prefix_str[i] == ',':
-                    i += 1
-                elif i < len(prefix_str) and prefix_str[i] == ')':
-                    i += 1
-                    break
-        return node
-
-    return parse()
+# Formulas reuse a handful of distinct symbols, so each is classified once.
+# Lowercase symbols are variables, or functions when they have arguments;
+# connectives and quantifiers classify as None.
+symbol_kinds: dict[str, str | None] = {}
+
+def classify_symbol(value: str) -> str | None:
+    if LOWERCASE_SYMBOL.fullmatch(value):
+        kind = "lowercase"
+    elif CONSTANT_SYMBOL.fullmatch(value):
+        kind = "constants"
+    elif PREDICATE_SYMBOL.fullmatch(value):
+        kind = "predicates"
+    else:
+        kind = None
+    if len(symbol_kinds) < 1 << 16:
+        symbol_kinds[value] = kind
+    return kind
+
+def signature_kind(node: ExpressionTree) -> str | None:
+    """The signature key a node's symbol is listed under, if any."""
+    value = node.value
+    kind = symbol_kinds[value] if value in symbol_kinds else classify_symbol(value)
+    if kind == "lowercase":
+        return "functions" if node.children else "variables"
+    return kind
+
+def subtree_signature(node: ExpressionTree, signatures: list[frozenset[tuple[str, str]]]) -> frozenset[tuple[str, str]]:
+    """The (signature key, symbol) pairs of the subtree."""
+    signature = merged(signatures)
+    kind = signature_kind(node)
+    if kind is not None and (kind, node.value) not in signature:
+        return signature | singleton((kind, node.value))
+    return signature
 
 def get_expression_signature_and_variables(expression: ExpressionTree, signature_and_vars: dict[str, set[str]]):
-    value = expression.value
+    # A signature already cached on the subtree is reused, but none is cached
+    # here: one pass is cheaper than filling in the signature of every node
+    if expression.facts is not None and "signature" in expression.facts:
+        for kind, value in expression.facts["signature"]:
+            signature_and_vars[kind].add(value)
+        return
 
-    # Variable: ^[a-z]+(\[\d+\])?$
-    if re.fullmatch(r"^[a-z]+(\[\d+\])?$", value):
-        if expression.arity() == 0:
-            signature_and_vars["variables"].add(value)
-        else:
-            signature_and_vars["functions"].add(value)
-    # Constant: ^(?<!\[)[0-9]+(?!\[)$
-    elif re.fullmatch(r"^(?<!\[)[0-9]+(?!\[)$", value):
-        signature_and_vars["constants"].add(value)
-    # Predicate: ^[A-Z]+(\[\d+\])?$
-    elif re.fullmatch(r"^[A-Z]+(\[\d+\])?$", value):
-        signature_and_vars["predicates"].add(value)
+    stack = [expression]
+    while stack:
+        e = stack.pop()
+        kind = signature_kind(e)
+        if kind is not None:
+            signature_and_vars[kind].add(e.value)
+        stack.extend(e.children)
 
-    for child in expression.children:
-        get_expression_signature_and_variables(child, signature_and_vars)
+# Streaming mode reads and writes in blocks of this many bytes
+STREAM_BLOCK_SIZE = 1 << 20
 
-def main():
-    expression_str = input().strip()
+def stream_lines(stream=None):
+    """Yield the stripped lines of stdin, read in large blocks rather than one input() per line."""
+    stream = stream or sys.stdin.buffer
+    pending = b""
+    while True:
+        block = stream.read(STREAM_BLOCK_SIZE)
+        if not block:
+            break
+        lines = (pending + block).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.decode().strip()
+    if pending:
+        yield pending.decode().strip()
+
+def stream_writer():
+    """A single block-buffered writer over stdout; flush it once at the end."""
+    sys.stdout.flush()
+    return open(sys.stdout.fileno(), "w", buffering=STREAM_BLOCK_SIZE, closefd=False)
+
+def signature_lines(expression_str: str) -> list[str]:
     expression_tree = parse_prefix_string(expression_str)
 
     signature = {
@@ -188,10 +410,26 @@ def main():
 
     get_expression_signature_and_variables(expression_tree, signature)
 
-    print("predicates:", sorted(signature["predicates"]))
-    print("functions:", sorted(signature["functions"]))
-    print("constants:", sorted(signature["constants"]))
-    print("variables:", sorted(signature["variables"]))
+    return [
+        f"predicates: {sorted(signature['predicates'])}",
+        f"functions: {sorted(signature['functions'])}",
+        f"constants: {sorted(signature['constants'])}",
+        f"variables: {sorted(signature['variables'])}",
+    ]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stream", action="store_true", help="report the signature of every line of stdin")
+    args = parser.parse_args()
+
+    if args.stream:
+        out = stream_writer()
+        for line in stream_lines():
+            out.write("\n".join(signature_lines(line)) + "\n")
+        out.flush()
+    else:
+        for line in signature_lines(input().strip()):
+            print(line)
 
 if __name__ == "__main__":
     main()
@@ -1,4 +1,8 @@
+import gc
 import re
+import sys
+import argparse
+from typing import Any, Callable
 
 class Alphabet:
     equality = "="
@@ -12,15 +16,25 @@ class Alphabet:
     ascend_seperator = ")" # All subexpressions from the descend seperator are a child of current expression
     level_seperator = "," # All expressions have the same parent
 
+# Leaves built here share one empty child tuple until a child is added to them
+NO_CHILDREN = ()
+
 class ExpressionTree:
+    # No per-node __dict__, large formulas allocate millions of these
+    __slots__ = ("value", "children", "parent", "facts")
     value: str
     children: list['ExpressionTree']
     parent: 'ExpressionTree'
+    facts: dict[str, Any] | None
 
     def __init__(self, value: str, children: list['ExpressionTree'], parent: 'ExpressionTree'):
-        self.value = value
+        # Symbols repeat throughout a formula, so every node shares one copy
+        self.value = sys.intern(value)
+        # The caller's list is kept as given, so it sees children added later
         self.children = children
         self.parent = parent
+        # Analysis attributes of the subtree, filled in by analysis()
+        self.facts = None
 
     def equals_expr() -> 'ExpressionTree':
         return ExpressionTree(Alphabet.equality, [None, None], None)
@@ -41,14 +55,65 @@ class ExpressionTree:
         return len(self.children)
 
     def add_child(self, new_expr: 'ExpressionTree'):
+        if self.children is NO_CHILDREN:
+            self.children = []
         self.children.append(new_expr)
         new_expr.parent = self
+        self.invalidate()
 
     # Helper Function
     # Replace Node A with Node B including the subtrees
     def replace(A: 'ExpressionTree', B: 'ExpressionTree'):
         B.parent = A.parent
         A.parent.children[A.parent.children.index(A)] = B
+        A.parent.invalidate()
+
+    # Helper Function
+    # An attribute of the subtree, built bottom up by combine(node, child values).
+    # It is computed without recursion and cached on every node of the subtree;
+    # like parsing, this pauses the cyclic collector while it allocates.
+    def analysis(self, name: str, combine: Callable[['ExpressionTree', list[Any]], Any]) -> Any:
+        if self.facts is not None and name in self.facts:
+            return self.facts[name]
+        # Pre-order over the nodes without the attribute, so reversed it visits children first
+        order = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            for child in node.children:
+                if child.facts is None or name not in child.facts:
+                    stack.append(child)
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for node in reversed(order):
+                if node.facts is None:
+                    node.facts = {}
+                node.facts[name] = combine(node, [child.facts[name] for child in node.children])
+        finally:
+            if collecting:
+                gc.enable()
+        return self.facts[name]
+
+    # Helper Function
+    # Call after changing this node. Anything cached on a node is cached on all
+    # of its descendants too, so clearing stops at the first ancestor with nothing cached.
+    def invalidate(self):
+        node = self
+        while node is not None and node.facts is not None:
+            node.facts = None
+            node = node.parent
+
+    def size(self) -> int:
+        return self.analysis("size", subtree_size)
+
+    def quantifier_depth(self) -> int:
+        return self.analysis("quantifier_depth", subtree_quantifier_depth)
+
+    # Names at the leaves that no quantifier above them binds
+    def free_variables(self) -> frozenset[str]:
+        return self.analysis("free_variables", subtree_free_variables)
 
     # Helper Function
     # Only use left if self was created by _expr() methods
@@ -58,6 +123,7 @@ class ExpressionTree:
     def set_left(self, value: 'ExpressionTree'):
         self.children[0] = value
         value.parent = self
+        self.invalidate()
     left = property(get_left, set_left)
 
     # Helper Function
@@ -68,6 +134,7 @@ class ExpressionTree:
     def set_right(self, value: 'ExpressionTree'):
         self.children[1] = value
         value.parent = self
+        self.invalidate()
     right = property(get_right, set_right)
 
     # Helper Function
@@ -78,83 +145,178 @@ class ExpressionTree:
     def set_child(self, value: 'ExpressionTree'):
         self.children[0] = value
         value.parent = self
+        self.invalidate()
     child = property(get_child, set_child)
 
+    # The serialisers below walk the tree with an explicit stack of nodes and
+    # the literal pieces that follow them, and yield the output piece by piece.
+    # as_*_str joins the pieces once; out.writelines(expr.iter_*()) streams them.
+    def iter_tree(self, depth = 0):
+        stack = [(self, depth)]
+        while stack:
+            node, depth = stack.pop()
+            yield depth * "    " + node.value + "\n"
+            for child in reversed(node.children):
+                stack.append((child, depth + 1))
+
+    def iter_prefix(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if type(node) is str:
+                yield node
+                continue
+            yield node.value
+            if node.children:
+                yield Alphabet.descend_seperator
+                push_arguments(stack, node.children, Alphabet.level_seperator)
+
+    def iter_postfix(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if type(node) is str:
+                yield node
+                continue
+            if node.children:
+                yield Alphabet.descend_seperator
+                stack.append(node.value)
+                push_arguments(stack, node.children, Alphabet.level_seperator + " ")
+            else:
+                yield node.value
+
+    def iter_standard(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if type(node) is str:
+                yield node
+                continue
+            if node.value in [ Alphabet.equality, Alphabet.conjunction, Alphabet.disjunction, Alphabet.implication ]:
+                yield Alphabet.descend_seperator
+                stack.append(Alphabet.ascend_seperator)
+                stack.append(node.right)
+                stack.append(" " + node.value + " ")
+                stack.append(node.left)
+            else:
+                yield node.value
+                if node.children:
+                    yield Alphabet.descend_seperator
+                    push_arguments(stack, node.children, Alphabet.level_seperator + " ")
+
     def as_tree_str(self, depth = 0) -> str:
-        result = depth * "    " +  self.value + "\n"
-        if self.arity() > 0:
-            for child in self.children:
-                result += child.as_tree_str(depth + 1)
-        return result 
+        return "".join(self.iter_tree(depth))
 
     def as_prefix_str(self) -> str:
-        result = self.value
-        if self.arity() > 0:
-            result += Alphabet.descend_seperator
-            for child in self.children[:-1]:
-                result += child.as_prefix_str() + Alphabet.level_seperator
-            result += self.children[-1].as_prefix_str() + Alphabet.ascend_seperator
-        return result 
-        
+        return "".join(self.iter_prefix())
+
     def as_postfix_str(self) -> str:
-        result = ""
-        if self.arity() > 0:
-            result += Alphabet.descend_seperator
-            for child in self.children[:-1]:
-                result += child.as_postfix_str() + Alphabet.level_seperator + " "
-            result += self.children[-1].as_postfix_str() + Alphabet.ascend_seperator
-        result += self.value
-        return result 
+        return "".join(self.iter_postfix())
 
     def as_standard_str(self) -> str:
-        if self.value in [ Alphabet.equality, Alphabet.conjunction, Alphabet.disjunction, Alphabet.implication ]:
-            result = Alphabet.descend_seperator + self.left.as_standard_str()
-            result += " " + self.value + " "
-            result += self.right.as_standard_str() + Alphabet.ascend_seperator
-        else:
-            result = self.value
-            if self.arity() > 0:
-                result += Alphabet.descend_seperator
-                for child in self.children[:-1]:
-                    result += child.as_standard_str() + Alphabet.level_seperator + " "
-                result +=  self.children[-1].as_standard_str() + Alphabet.ascend_seperator
-
-        return result
+        return "".join(self.iter_standard())
+
+# Leaf sets are shared, a formula mentions only a few distinct names
+singletons: dict[Any, frozenset] = {}
+
+def singleton(item: Any) -> frozenset:
+    result = singletons.get(item)
+    if result is None:
+        result = frozenset([item])
+        if len(singletons) < 1 << 16:
+            singletons[item] = result
+    return result
+
+def merged(sets: list[frozenset]) -> frozenset:
+    # The largest set is reused when the others add nothing to it, so the
+    # nodes along a long chain share one set instead of holding copies
+    if len(sets) == 1:
+        return sets[0]
+    largest = max(sets, key=len, default=frozenset())
+    for other in sets:
+        if not other <= largest:
+            return largest.union(*sets)
+    return largest
+
+def subtree_size(node: ExpressionTree, sizes: list[int]) -> int:
+    return 1 + sum(sizes)
+
+def subtree_quantifier_depth(node: ExpressionTree, depths: list[int]) -> int:
+    quantifier = node.value.startswith(Alphabet.forall) or node.value.startswith(Alphabet.exists)
+    return max(depths, default=0) + quantifier
+
+def subtree_free_variables(node: ExpressionTree, names: list[frozenset[str]]) -> frozenset[str]:
+    v = node.value
+    if v.startswith(Alphabet.forall) or v.startswith(Alphabet.exists):
+        free = merged(names)
+        return free - { v[1:] } if v[1:] in free else free
+    if not names:
+        return singleton(v)
+    return merged(names)
+
+def push_arguments(stack: list, children: list[ExpressionTree], seperator: str):
+    # Pushed in reverse, so they pop as: first child, seperator, ..., last child, ")"
+    stack.append(Alphabet.ascend_seperator)
+    stack.append(children[-1])
+    for child in children[-2::-1]:
+        stack.append(seperator)
+        stack.append(child)
+
+# A node's value runs from after any leading spaces up to the next seperator
+PREFIX_VALUE = re.compile(r" *([^(),]*)")
+PREFIX_SPACES = re.compile(r" *")
 
 def parse_prefix_string(prefix_str: str) -> ExpressionTree:
+    """
+        Parse with an explicit stack of nodes whose argument lists are still
+        open, so memory does not depend on the nesting depth of the formula.
+        The cyclic collector is paused while the tree is built: every node
+        links to its parent, and rescanning the growing tree would dominate
+        the parse time.
+    """
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        return parse_nodes(prefix_str)
+    finally:
+        if collecting:
+            gc.enable()
+
+def parse_nodes(prefix_str: str) -> ExpressionTree:
     i = 0
+    n = len(prefix_str)
+    open_nodes = []
 
-    def parse():
-        nonlocal i
-        while i < len(prefix_str) and prefix_str[i] == " ":
-            i += 1
-
+    while True:
         # Read value
-        start = i
-        while i < len(prefix_str) and prefix_str[i] not in "(),":
-            i += 1
-        value = prefix_str[start:i]
-
-        node = ExpressionTree(value, [], None)
-
-        while i < len(prefix_str) and prefix_str[i] == " ":
-            i += 1
+        match = PREFIX_VALUE.match(prefix_str, i)
+        i = match.end()
+        node = ExpressionTree(match.group(1), NO_CHILDREN, None)
+        if open_nodes:
+            open_nodes[-1].add_child(node)
+        else:
+            root = node
 
-        if i < len(prefix_str) and prefix_str[i] == '(':
+        if i < n and prefix_str[i] == '(':
             i += 1
-            while True:
-                child = parse()
-                node.add_child(child)
-                while i < len(prefix_str) and prefix_str[i] == " ":
-                    i += 1
-                if i < len(prefix_str) and prefix_str[i] == ',':
-                    i += 1
-                elif i < len(prefix_str) and prefix_str[i] == ')':
-                    i += 1
-                    break
-        return node
-
-    return parse()
+            open_nodes.append(node)
+            continue
+
+        # The node is complete, close every argument list that ends here
+        while open_nodes:
+            i = PREFIX_SPACES.match(prefix_str, i).end()
+            if i >= n:
+                return root
+            if prefix_str[i] == ',':
+                i += 1
+                break
+            elif prefix_str[i] == ')':
+                i += 1
+                open_nodes.pop()
+            else:
+                break
+        else:
+            return root
 
 def get_expression_signature_and_variables(expression: ExpressionTree, signature_and_vars: dict[str, set[str]]):
     value = expression.value
@@ -176,74 +338,108 @@ def get_expression_signature_and_variables(expression: ExpressionTree, signature
         get_expression_signature_and_variables(child, signature_and_vars)
 
 def nnf_simplify(expression: ExpressionTree) -> ExpressionTree:
-    # Apply recursively to children first
-    for i in range(len(expression.children)):
-        expression.children[i] = nnf_simplify(expression.children[i])
-        expression.children[i].parent = expression
-
-    # === Implication (d): A → B → (!A | B)
-    if expression.value == Alphabet.implication:
-        not_A = ExpressionTree.not_expr()
-        not_A.child = expression.left
-        new_or = ExpressionTree.or_expr()
-        new_or.left = not_A
-        new_or.right = expression.right
-        return nnf_simplify(new_or)
-
-    # === Double Negation (a): !(!(A)) → A
-    if expression.value == Alphabet.negation:
-        inner = expression.child
-        if inner.value == Alphabet.negation:
-            return nnf_simplify(inner.child)
-
-        # === De Morgan’s Laws
-        # (b): !(A | B) → (!A & !B)
-        if inner.value == Alphabet.disjunction:
-            left = ExpressionTree.not_expr()
-            left.child = inner.left
-            right = ExpressionTree.not_expr()
-            right.child = inner.right
-            new_and = ExpressionTree.and_expr()
-            new_and.left = nnf_simplify(left)
-            new_and.right = nnf_simplify(right)
-            return new_and
-
-        # (c): !(A & B) → (!A | !B)
-        if inner.value == Alphabet.conjunction:
-            left = ExpressionTree.not_expr()
-            left.child = inner.left
-            right = ExpressionTree.not_expr()
-            right.child = inner.right
-            new_or = ExpressionTree.or_expr()
-            new_or.left = nnf_simplify(left)
-            new_or.right = nnf_simplify(right)
-            return new_or
+    """
+        Push negations down in one iterative pass. Each node is visited once
+        with a flag saying whether an odd number of negations lie above it:
+        negations are dropped, and the remaining nodes are rewritten in place
+        (implications become disjunctions of the negated left side, and under
+        a negation connectives and quantifiers turn into their duals).
+    """
+    dual = {
+        Alphabet.conjunction: Alphabet.disjunction,
+        Alphabet.disjunction: Alphabet.conjunction,
+        Alphabet.forall: Alphabet.exists,
+        Alphabet.exists: Alphabet.forall,
+    }
+    root = None
+    # Every node is rewritten or re-parented, so no cached analysis survives
+    expression.invalidate()
+    # (node, negated, node whose child it becomes, child index)
+    stack = [(expression, False, None, 0)]
+    while stack:
+        e, negated, owner, index = stack.pop()
+        while e.value == Alphabet.negation:
+            e = e.child
+            negated = not negated
+        e.facts = None
+        v = e.value
+
+        # === Implication (d): A → B → (!A | B), and !(A → B) → (A & !B)
+        if v == Alphabet.implication:
+            e.value = Alphabet.conjunction if negated else Alphabet.disjunction
+            stack.append((e.right, negated, e, 1))
+            stack.append((e.left, not negated, e, 0))
+
+        # === De Morgan’s Laws (b) and (c)
+        elif v in [ Alphabet.conjunction, Alphabet.disjunction ]:
+            if negated:
+                e.value = dual[v]
+            for i in range(len(e.children) - 1, -1, -1):
+                stack.append((e.children[i], negated, e, i))
 
         # === Quantifier negation (e) and (f)
-        if inner.value.startswith(Alphabet.forall):
-            var = inner.value[1:]
-            not_inner = ExpressionTree.not_expr()
-            not_inner.child = inner.child
-            exists_expr = ExpressionTree.exists_expr(var)
-            exists_expr.child = nnf_simplify(not_inner)
-            return exists_expr
-
-        if inner.value.startswith(Alphabet.exists):
-            var = inner.value[1:]
-            not_inner = ExpressionTree.not_expr()
-            not_inner.child = inner.child
-            forall_expr = ExpressionTree.forall_expr(var)
-            forall_expr.child = nnf_simplify(not_inner)
-            return forall_expr
-
-    return expression
+        elif v.startswith(Alphabet.forall) or v.startswith(Alphabet.exists):
+            if negated:
+                e.value = dual[v[0]] + v[1:]
+            stack.append((e.child, negated, e, 0))
+
+        # Atoms keep their negation, their terms are left as they are
+        else:
+            for i in range(len(e.children) - 1, -1, -1):
+                stack.append((e.children[i], False, e, i))
+            if negated:
+                not_e = ExpressionTree.not_expr()
+                not_e.child = e
+                e = not_e
+
+        if owner is None:
+            root = e
+        else:
+            owner.children[index] = e
+            e.parent = owner
+    return root
+
+# Streaming mode reads and writes in blocks of this many bytes
+STREAM_BLOCK_SIZE = 1 << 20
+
+def stream_lines(stream=None):
+    """Yield the stripped lines of stdin, read in large blocks rather than one input() per line."""
+    stream = stream or sys.stdin.buffer
+    pending = b""
+    while True:
+        block = stream.read(STREAM_BLOCK_SIZE)
+        if not block:
+            break
+        lines = (pending + block).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.decode().strip()
+    if pending:
+        yield pending.decode().strip()
+
+def stream_writer():
+    """A single block-buffered writer over stdout; flush it once at the end."""
+    sys.stdout.flush()
+    return open(sys.stdout.fileno(), "w", buffering=STREAM_BLOCK_SIZE, closefd=False)
+
 def main():
-    t = input()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stream", action="store_true", help="convert every line of stdin")
+    args = parser.parse_args()
+
+    if args.stream:
+        out = stream_writer()
+        for line in stream_lines():
+            out.writelines(nnf_simplify(parse_prefix_string(line)).iter_prefix())
+            out.write("\n")
+        out.flush()
+    else:
+        t = input()
 
-    
-    expr = parse_prefix_string(t)
-    simplified = nnf_simplify(expr)
-    print(simplified.as_prefix_str())
+        
+        expr = parse_prefix_string(t)
+        simplified = nnf_simplify(expr)
+        print(simplified.as_prefix_str())
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,66 @@
+import gc
 import re
+import itertools
+import sys
 import json
-from typing import Any
+from array import array
+from bisect import bisect_right
+import argparse
+import multiprocessing
+from collections import Counter, OrderedDict
+from typing import Any, Callable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The tape doubles when the head runs off its right end, starting from this many cells
+TAPE_CELLS = 4096
+
+class Configuration:
+    """
+        Where a run stopped. state and the tape's symbols are indices into
+        the machine's states and alphabet; halted is False when the step
+        budget ran out first.
+    """
+    __slots__ = ("state", "head", "tape", "steps", "halted")
+
+    def __init__(self, state: int, head: int, tape: bytearray | array, steps: int, halted: bool):
+        self.state = state
+        self.head = head
+        self.tape = tape
+        self.steps = steps
+        self.halted = halted
+
+class History:
+    """
+        The first steps of a run as indexed arrays: the state and head at
+        every time, and for each cell the times its symbol changed, so the
+        tape at a time is a binary search rather than a copy per step.
+    """
+    __slots__ = ("states", "heads", "changes", "steps", "halted")
+
+    def __init__(self, cells: int):
+        self.states = array("l")
+        self.heads = array("l")
+        self.changes: list[tuple[array, array] | None] = [None] * cells
+        self.steps = 0
+        self.halted = False
+
+    def write(self, time: int, cell: int, symbol: int):
+        if self.changes[cell] is None:
+            self.changes[cell] = (array("l"), array("l"))
+        times, symbols = self.changes[cell]
+        times.append(time)
+        symbols.append(symbol)
+
+    def symbol(self, time: int, cell: int) -> int:
+        changes = self.changes[cell] if cell < len(self.changes) else None
+        i = bisect_right(changes[0], time) if changes is not None else 0
+        if i == 0:
+            return 1 if cell == 0 else 0
+        return changes[1][i - 1]
 
 class TuringMachine:
     states: list[int]
@@ -9,6 +69,8 @@ class TuringMachine:
     initial_state: int
     accept_state: int
     reject_state: int
+    symbol_index: dict[int, int]
+    table: list[tuple[int, int, int] | None]
 
     def __init__(self):
         self.states = [ 0, 1, 2 ]
@@ -17,43 +79,420 @@ class TuringMachine:
         self.initial_state = 0
         self.accept_state = 1
         self.reject_state = 2
+        self.build_table()
+
+    def build_table(self):
+        """
+            The transitions as a dense table: the entry for state q reading
+            symbol a is at q * len(alphabet) + a. Transitions name states and
+            symbols by their position, as phi_M does (sample1 reads symbol 2
+            from the alphabet [0,1,3,4]), so alphabet values are only mapped
+            to positions when a word is written onto the tape.
+            An entry is (next state's row, write, move), or None where the
+            machine halts. The accept and reject states have no entries, and
+            the first transition for a (state, symbol) pair is the one kept.
+        """
+        width = len(self.alphabet)
+        table = [None] * (len(self.states) * width)
+        for transition in self.transitions:
+            state, read, next_state, write, direction = transition
+            if not (0 <= state < len(self.states) and 0 <= next_state < len(self.states)):
+                raise ValueError(f"transition {list(transition)} names a state outside {self.states}")
+            if not (0 <= read < width and 0 <= write < width):
+                raise ValueError(f"transition {list(transition)} names a symbol outside {self.alphabet}")
+            if state in [ self.accept_state, self.reject_state ] or table[state * width + read] is not None:
+                continue
+            table[state * width + read] = (next_state * width, write, direction)
+        self.symbol_index = { symbol: i for i, symbol in enumerate(self.alphabet) }
+        self.table = table
+
+    def run(self, budget: int, word: list[int] = ()) -> Configuration:
+        """
+            Run for at most budget steps from the start phi_M describes: the
+            end-of-tape symbol in cell 0, then word (alphabet values), then
+            blanks, with the head on cell 1. A left move from cell 0 stays.
+        """
+        width = len(self.alphabet)
+        cells = max(TAPE_CELLS, len(word) + 2)
+        tape = bytearray(cells) if width <= 256 else array("I", bytes(4 * cells))
+        tape[0] = 1
+        for i, symbol in enumerate(word):
+            tape[i + 1] = self.symbol_index[symbol]
+
+        table = self.table
+        row, head, end = self.initial_state * width, 1, len(tape)
+        steps = budget
+        for step in range(budget):
+            entry = table[row + tape[head]]
+            if entry is None:
+                steps = step
+                break
+            row, tape[head], move = entry
+            head += move
+            if head == end:
+                tape.extend(bytes(end))
+                end += end
+            elif head < 0:
+                head = 0
+        halted = table[row + tape[head]] is None
+        return Configuration(row // width, head, tape, steps, halted)
+
+    def trace(self, budget: int) -> History:
+        """
+            The configurations at times 0..budget of the run from phi_M's
+            start with no word. Once the machine halts its last configuration
+            repeats, so every time has one.
+        """
+        width = len(self.alphabet)
+        # The head moves one cell a step, so it never passes cell budget + 1
+        history = History(budget + 2)
+        tape = bytearray(budget + 2) if width <= 256 else array("I", bytes(4 * (budget + 2)))
+        tape[0] = 1
+
+        table, states, heads = self.table, history.states, history.heads
+        row, head = self.initial_state * width, 1
+        for time in range(budget + 1):
+            states.append(row // width)
+            heads.append(head)
+            entry = table[row + tape[head]]
+            if entry is None:
+                history.halted = True
+                break
+            if time == budget:
+                break
+            row, symbol, move = entry
+            if symbol != tape[head]:
+                history.write(time + 1, head, symbol)
+                tape[head] = symbol
+            head = max(head + move, 0)
+        history.steps = len(states) - 1
+        states.extend(array("l", [states[-1]]) * (budget + 1 - len(states)))
+        heads.extend(array("l", [heads[-1]]) * (budget + 1 - len(heads)))
+        return history
+
+    def word(self, configuration: Configuration) -> list[int]:
+        """The tape after cell 0 as alphabet values, without its trailing blanks."""
+        tape = configuration.tape
+        last = len(tape) - 1
+        while last > 0 and tape[last] == 0:
+            last -= 1
+        return [self.alphabet[symbol] for symbol in tape[1:last + 1]]
 
     def from_json(json_string: str) -> 'TuringMachine':
         """
-            TODO: Parse the following JSON structure as a string into the TuringMachine 
-            {
-                // Always will have initial, accept and reject states
-                "states": [ 0, 1, 2, ... ],
-                // Always will have blank symbol as the first symbol, but does not need to be 0
-                // Always will have end-of-tape symbol as the second symbol, but does not need to be 1
-                "alphabet": [ 0, 1, ... ], 
-                "transitions": [
-                    // [ current state, read symbol, next state, write symbol, direction ]
-                    // direction: L = -1, R = 1
-                    [ 0, 0, 0, 0, 1 ],
-                    [ 0, 1, 0, 0, -1 ],
-                    ...
-                ],
-                "initial_state": 0, // Is an index into "states", will always exist in states, but does not need to be 0
-                "accept_state": 1,  // Is an index into "states", will always exist in states, but does not need to be 1
-                "reject_state": 2,  // Is an index into "states", will always exist in states, but does not need to be 2
-            }
+            A machine from its JSON description, an object with the keys
+            "states" and "alphabet" (lists of ints; the alphabet starts with
+            the blank and then the end-of-tape symbol), "transitions" (a list
+            of [state, read, next state, write, direction] with direction -1
+            for left and 1 for right), and "initial_state", "accept_state"
+            and "reject_state", each one of the states.
         """
-        pass
+        data = json.loads(json_string)
+        machine = TuringMachine()
+        machine.states = data["states"]
+        machine.alphabet = data["alphabet"]
+        machine.transitions = [tuple(transition) for transition in data["transitions"]]
+        machine.initial_state = data["initial_state"]
+        machine.accept_state = data["accept_state"]
+        machine.reject_state = data["reject_state"]
+        machine.build_table()
+        return machine
+
+# Rough per-entry costs used to pick the smallest predicate index or function table
+SET_ENTRY_BYTES = 64
+BITSET_ENTRY_BYTES = 1 / 8
+ARRAY_ENTRY_BYTES = 8
+
+class HashSetIndex:
+    """Membership over the listed tuples, stored as their mixed-radix positions."""
+    def __init__(self, positions: set[int]):
+        self.positions = frozenset(positions)
+
+    def __contains__(self, position: int) -> bool:
+        return position in self.positions
+
+class BitsetIndex:
+    """One bit per tuple of D^arity, addressed by its mixed-radix position."""
+    def __init__(self, total: int, positions: set[int]):
+        self.bits = bytearray((total + 7) // 8)
+        for position in positions:
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, position: int) -> bool:
+        return bool(self.bits[position >> 3] >> (position & 7) & 1)
+
+class ComplementIndex:
+    """Membership over the tuples of D^arity that are *not* listed."""
+    def __init__(self, total: int, positions: set[int]):
+        self.missing = frozenset(position for position in range(total) if position not in positions)
+
+    def __contains__(self, position: int) -> bool:
+        return position not in self.missing
+
+def index_predicate(total: int, positions: set[int]):
+    """
+        Pick the smallest membership structure for a predicate's positions:
+        a hash set, a bitset over D^arity, or the complement set.
+    """
+    costs = {
+        HashSetIndex: len(positions) * SET_ENTRY_BYTES,
+        BitsetIndex: total * BITSET_ENTRY_BYTES,
+        ComplementIndex: (total - len(positions)) * SET_ENTRY_BYTES,
+    }
+    best = min(costs, key=costs.get)
+    return best(total, positions) if best is not HashSetIndex else HashSetIndex(positions)
+
+class Relation:
+    """
+        A predicate at one arity over interned ids. Tuples of domain elements are
+        looked up by position in the index, anything else by its id tuple.
+    """
+    def __init__(self, size: int, arity: int, index: Any, others: set[tuple[int, ...]]):
+        self.size = size
+        self.arity = arity
+        self.index = index
+        self.others = frozenset(others)
+
+    def holds(self, args: tuple[int, ...]) -> bool:
+        position = 0
+        for arg in args:
+            if arg >= self.size:
+                return args in self.others
+            position = position * self.size + arg
+        return position in self.index
+
+class KeyRelation:
+    """Fallback for names interpreted as a constant string, matched by "a,b,c" substring."""
+    def __init__(self, model: 'Model', value: str):
+        self.model = model
+        self.value = value
+
+    def holds(self, args: tuple[int, ...]) -> bool:
+        return ",".join([self.model.elements[arg] for arg in args]) in self.value
+
+class JoinedKeyRelation:
+    """Membership by the whole "a,b,c" key, for domains whose elements contain the separator."""
+    def __init__(self, model: 'Model', keys: list[str] | dict[str, str]):
+        self.model = model
+        self.keys = frozenset(keys)
+
+    def holds(self, args: tuple[int, ...]) -> bool:
+        return ",".join([self.model.elements[arg] for arg in args]) in self.keys
+
+class JoinedKeyFunction:
+    """Results by the whole "a,b,c" key, for domains whose elements contain the separator."""
+    def __init__(self, model: 'Model', results: dict[str, str]):
+        self.model = model
+        self.results = results
+
+    def apply(self, args: tuple[int, ...]) -> int:
+        return self.model.intern(self.results[",".join([self.model.elements[arg] for arg in args])])
+
+class SparseValues(dict):
+    """Mixed-radix positions to ids for a function defined on few tuples, -1 elsewhere like the array."""
+    def __missing__(self, position: int) -> int:
+        return -1
+
+class FunctionTable:
+    """
+        A function at one arity over interned ids. Results for tuples of domain
+        elements live in a flat array indexed by mixed-radix position (-1 when
+        undefined), or in a SparseValues map when entries, the number of tuples
+        that will be defined, is far below size^arity; tuples involving other
+        ids live in a small dict.
+    """
+    def __init__(self, size: int, arity: int, entries: int | None = None):
+        self.size = size
+        self.arity = arity
+        if entries is not None and entries * SET_ENTRY_BYTES < size ** arity * ARRAY_ENTRY_BYTES:
+            self.values = SparseValues()
+        else:
+            self.values = array("q", [-1]) * (size ** arity)
+        self.others: dict[tuple[int, ...], int] = {}
+
+    def position(self, args: tuple[int, ...]) -> int:
+        position = 0
+        for arg in args:
+            if arg >= self.size:
+                return -1
+            position = position * self.size + arg
+        return position
+
+    def apply(self, args: tuple[int, ...]) -> int:
+        position = self.position(args)
+        result = self.values[position] if position >= 0 else self.others.get(args, -1)
+        if result < 0:
+            raise KeyError(args)
+        return result
 
 class Model:
     def __init__(self):
         self.domain: list[str] = []
         self.interpretations: dict[str, Any] = {}
+        # Interned ids: domain elements first, so an id below size is a domain element
+        self.ids: dict[Any, int] = {}
+        self.elements: list[Any] = []
+        self.size: int = 0
+        self.domain_ids: list[int] = []
+        self.constants: dict[str, int] = {}
+        self.functions: dict[tuple[str, int], FunctionTable] = {}
+        self.predicates: dict[tuple[str, int], Relation] = {}
+        self.compiled: OrderedDict[tuple[str, bool], Callable[[dict[str, int]], bool]] = OrderedDict()
+        self.memo: SubformulaCache = None
+        self.tables: dict[Any, Any] = {}
 
     @staticmethod
     def from_json(json_str: str) -> 'Model':
         data = json.loads(json_str)
+        # Interned the way from_tables interns, so the tables' ids carry over
+        builder = Model()
+        builder.domain = data['domain']
+        builder.interpretations = data['interpretations']
+        tabled = builder.build_tables()
+        constants = {
+            name: value for name, value in builder.interpretations.items()
+            if not tabled or not isinstance(value, (list, dict))
+        }
+        return Model.from_tables(builder.domain, constants, builder.functions, builder.predicates, builder.elements[builder.size:])
+
+    @staticmethod
+    def from_tables(domain: list[str], constants: dict[str, Any],
+                    functions: dict[tuple[str, int], FunctionTable],
+                    predicates: dict[tuple[str, int], Relation],
+                    elements: list[Any] = ()) -> 'Model':
+        """
+            A model over tables already built on interned ids: the domain has
+            the ids 0..size-1 in order, and elements lists the elements of any
+            further ids the tables use. constants interprets the other names.
+        """
         model = Model()
-        model.domain = data['domain']
-        model.interpretations = data['interpretations']
+        model.domain = domain
+        for element in domain:
+            model.intern(element)
+        model.size = len(model.elements)
+        model.domain_ids = [model.ids[element] for element in domain]
+        for element in elements:
+            model.intern(element)
+        model.functions = functions
+        model.predicates = predicates
+        # Names keep resolving the way the JSON did, to a marker for their map or list
+        model.interpretations = dict(constants)
+        for name, _ in predicates:
+            model.interpretations[name] = (name, "list")
+        for name, _ in functions:
+            model.interpretations[name] = (name, "dict")
         return model
 
+    def intern(self, element: Any) -> int:
+        i = self.ids.get(element)
+        if i is None:
+            i = self.ids[element] = len(self.elements)
+            self.elements.append(element)
+        return i
+
+    def key_ids(self, key: str) -> tuple[int, ...]:
+        return tuple(self.intern(part) for part in key.split(","))
+
+    def build_tables(self) -> bool:
+        """
+            Intern the domain to dense ints and build the JSON function maps
+            and predicate lists into tables over those ids, for from_tables.
+            Builds nothing and returns False when a domain element contains
+            the key separator, since such keys cannot be split back into
+            elements; those maps and lists are then looked up by whole key.
+        """
+        for element in self.domain:
+            self.intern(element)
+        self.size = len(self.elements)
+        self.domain_ids = [self.ids[element] for element in self.domain]
+        if any("," in element for element in self.domain):
+            return False
+
+        for name, value in self.interpretations.items():
+            if isinstance(value, dict):
+                self.build_function(name, value)
+            if isinstance(value, (list, dict)):
+                self.build_relation(name, value)
+        return True
+
+    def key_position(self, parts: list[str]) -> int:
+        # Mixed-radix position of a tuple of domain elements, -1 if any part is not one
+        ids, size = self.ids, self.size
+        position = 0
+        for part in parts:
+            i = ids.get(part, size)
+            if i >= size:
+                return -1
+            position = position * size + i
+        return position
+
+    def build_function(self, name: str, value: dict[str, str]):
+        entries = Counter(key.count(",") + 1 for key in value)
+        for key, result in value.items():
+            parts = key.split(",")
+            table = self.functions.get((name, len(parts)))
+            if table is None:
+                table = self.functions[(name, len(parts))] = FunctionTable(self.size, len(parts), entries[len(parts)])
+            position = self.key_position(parts)
+            if position >= 0:
+                table.values[position] = self.intern(result)
+            else:
+                table.others[self.key_ids(key)] = self.intern(result)
+
+    def build_relation(self, name: str, keys: list[str] | dict[str, str]):
+        positions: dict[int, set[int]] = {}
+        others: dict[int, set[tuple[int, ...]]] = {}
+        for key in keys:
+            parts = key.split(",")
+            if len(parts) not in positions:
+                positions[len(parts)] = set()
+                others[len(parts)] = set()
+            position = self.key_position(parts)
+            if position >= 0:
+                positions[len(parts)].add(position)
+            else:
+                others[len(parts)].add(self.key_ids(key))
+        for arity in positions:
+            index = index_predicate(self.size ** arity, positions[arity])
+            self.predicates[(name, arity)] = Relation(self.size, arity, index, others[arity])
+
+    def constant(self, name: str) -> int:
+        """Id of a term leaf that is not a bound variable: its interpretation, or the name itself."""
+        if name not in self.constants:
+            value = self.interpretations.get(name, name)
+            if isinstance(value, (list, dict)):
+                # A map or list kept by whole key stands for itself, like a table's marker
+                value = (name, type(value).__name__)
+            self.constants[name] = self.intern(value)
+        return self.constants[name]
+
+    def function(self, name: str, arity: int) -> FunctionTable | JoinedKeyFunction:
+        if (name, arity) not in self.functions:
+            value = self.interpretations.get(name)
+            if isinstance(value, dict):
+                self.functions[(name, arity)] = JoinedKeyFunction(self, value)
+            else:
+                self.functions[(name, arity)] = FunctionTable(0, arity)
+        return self.functions[(name, arity)]
+
+    def relation(self, name: str, arity: int) -> Relation | KeyRelation | JoinedKeyRelation:
+        if (name, arity) not in self.predicates:
+            value = self.interpretations.get(name)
+            if isinstance(value, str):
+                self.predicates[(name, arity)] = KeyRelation(self, value)
+            elif isinstance(value, (list, dict)):
+                self.predicates[(name, arity)] = JoinedKeyRelation(self, value)
+            else:
+                self.predicates[(name, arity)] = Relation(self.size, arity, HashSetIndex(set()), set())
+        return self.predicates[(name, arity)]
+
+    def proposition(self, name: str) -> bool:
+        # A nullary atom holds when its interpretation equals that of the empty key
+        return name in self.interpretations and self.interpretations[name] == self.interpretations.get("", "")
+
+    def bind(self, assignment: dict[str, str]) -> dict[str, int]:
+        return { var: self.intern(value) for var, value in assignment.items() }
+
 class Alphabet:
     equality = "="
     negation = "!"
@@ -66,15 +505,25 @@ class Alphabet:
     ascend_seperator = ")" # All subexpressions from the descend seperator are a child of current expression
     level_seperator = "," # All expressions have the same parent
 
+# Leaves built here share one empty child tuple until a child is added to them
+NO_CHILDREN = ()
+
 class ExpressionTree:
+    # No per-node __dict__, large formulas allocate millions of these
+    __slots__ = ("value", "children", "parent", "facts")
     value: str
     children: list['ExpressionTree']
     parent: 'ExpressionTree'
+    facts: dict[str, Any] | None
 
     def __init__(self, value: str, children: list['ExpressionTree'], parent: 'ExpressionTree'):
-        self.value = value
+        # Symbols repeat throughout a formula, so every node shares one copy
+        self.value = sys.intern(value)
+        # The caller's list is kept as given, so it sees children added later
         self.children = children
         self.parent = parent
+        # Analysis attributes of the subtree, filled in by analysis()
+        self.facts = None
 
     def equals_expr() -> 'ExpressionTree':
         return ExpressionTree(Alphabet.equality, [None, None], None)
@@ -95,14 +544,73 @@ class ExpressionTree:
         return len(self.children)
 
     def add_child(self, new_expr: 'ExpressionTree'):
+        if self.children is NO_CHILDREN:
+            self.children = []
         self.children.append(new_expr)
         new_expr.parent = self
+        self.invalidate()
 
     # Helper Function
     # Replace Node A with Node B including the subtrees
     def replace(A: 'ExpressionTree', B: 'ExpressionTree'):
         B.parent = A.parent
         A.parent.children[A.parent.children.index(A)] = B
+        A.parent.invalidate()
+
+    # Helper Function
+    # An attribute of the subtree, built bottom up by combine(node, child values).
+    # It is computed without recursion and cached on every node of the subtree;
+    # like parsing, this pauses the cyclic collector while it allocates.
+    def analysis(self, name: str, combine: Callable[['ExpressionTree', list[Any]], Any]) -> Any:
+        if self.facts is not None and name in self.facts:
+            return self.facts[name]
+        # Post-order over the nodes without the attribute, each once, so a
+        # SharedNodes DAG costs its distinct nodes rather than its tree size
+        order = []
+        seen = set()
+        stack = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                order.append(node)
+                continue
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            stack.append((node, True))
+            for child in node.children:
+                if (child.facts is None or name not in child.facts) and id(child) not in seen:
+                    stack.append((child, False))
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for node in order:
+                if node.facts is None:
+                    node.facts = {}
+                node.facts[name] = combine(node, [child.facts[name] for child in node.children])
+        finally:
+            if collecting:
+                gc.enable()
+        return self.facts[name]
+
+    # Helper Function
+    # Call after changing this node. Anything cached on a node is cached on all
+    # of its descendants too, so clearing stops at the first ancestor with nothing cached.
+    def invalidate(self):
+        node = self
+        while node is not None and node.facts is not None:
+            node.facts = None
+            node = node.parent
+
+    def size(self) -> int:
+        return self.analysis("size", subtree_size)
+
+    def quantifier_depth(self) -> int:
+        return self.analysis("quantifier_depth", subtree_quantifier_depth)
+
+    # Names at the leaves that no quantifier above them binds
+    def free_variables(self) -> frozenset[str]:
+        return self.analysis("free_variables", subtree_free_variables)
 
     # Helper Function
     # Only use left if self was created by _expr() methods
@@ -112,6 +620,7 @@ class ExpressionTree:
     def set_left(self, value: 'ExpressionTree'):
         self.children[0] = value
         value.parent = self
+        self.invalidate()
     left = property(get_left, set_left)
 
     # Helper Function
@@ -122,6 +631,7 @@ class ExpressionTree:
     def set_right(self, value: 'ExpressionTree'):
         self.children[1] = value
         value.parent = self
+        self.invalidate()
     right = property(get_right, set_right)
 
     # Helper Function
@@ -132,83 +642,262 @@ class ExpressionTree:
     def set_child(self, value: 'ExpressionTree'):
         self.children[0] = value
         value.parent = self
+        self.invalidate()
     child = property(get_child, set_child)
 
+    # The serialisers below walk the tree with an explicit stack of nodes and
+    # the literal pieces that follow them, and yield the output piece by piece.
+    # as_*_str joins the pieces once; out.writelines(expr.iter_*()) streams them.
+    def iter_tree(self, depth = 0):
+        stack = [(self, depth)]
+        while stack:
+            node, depth = stack.pop()
+            yield depth * "    " + node.value + "\n"
+            for child in reversed(node.children):
+                stack.append((child, depth + 1))
+
+    def iter_prefix(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if type(node) is str:
+                yield node
+                continue
+            yield node.value
+            if node.children:
+                yield Alphabet.descend_seperator
+                push_arguments(stack, node.children, Alphabet.level_seperator)
+
+    def iter_postfix(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if type(node) is str:
+                yield node
+                continue
+            if node.children:
+                yield Alphabet.descend_seperator
+                stack.append(node.value)
+                push_arguments(stack, node.children, Alphabet.level_seperator + " ")
+            else:
+                yield node.value
+
+    def iter_standard(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if type(node) is str:
+                yield node
+                continue
+            if node.value in [ Alphabet.equality, Alphabet.conjunction, Alphabet.disjunction, Alphabet.implication ]:
+                yield Alphabet.descend_seperator
+                stack.append(Alphabet.ascend_seperator)
+                stack.append(node.right)
+                stack.append(" " + node.value + " ")
+                stack.append(node.left)
+            else:
+                yield node.value
+                if node.children:
+                    yield Alphabet.descend_seperator
+                    push_arguments(stack, node.children, Alphabet.level_seperator + " ")
+
     def as_tree_str(self, depth = 0) -> str:
-        result = depth * "    " +  self.value + "\n"
-        if self.arity() > 0:
-            for child in self.children:
-                result += child.as_tree_str(depth + 1)
-        return result 
+        return "".join(self.iter_tree(depth))
 
     def as_prefix_str(self) -> str:
-        result = self.value
-        if self.arity() > 0:
-            result += Alphabet.descend_seperator
-            for child in self.children[:-1]:
-                result += child.as_prefix_str() + Alphabet.level_seperator
-            result += self.children[-1].as_prefix_str() + Alphabet.ascend_seperator
-        return result 
-        
+        return "".join(self.iter_prefix())
+
     def as_postfix_str(self) -> str:
-        result = ""
-        if self.arity() > 0:
-            result += Alphabet.descend_seperator
-            for child in self.children[:-1]:
-                result += child.as_postfix_str() + Alphabet.level_seperator + " "
-            result += self.children[-1].as_postfix_str() + Alphabet.ascend_seperator
-        result += self.value
-        return result 
+        return "".join(self.iter_postfix())
 
     def as_standard_str(self) -> str:
-        if self.value in [ Alphabet.equality, Alphabet.conjunction, Alphabet.disjunction, Alphabet.implication ]:
-            result = Alphabet.descend_seperator + self.left.as_standard_str()
-            result += " " + self.value + " "
-            result += self.right.as_standard_str() + Alphabet.ascend_seperator
-        else:
-            result = self.value
-            if self.arity() > 0:
-                result += Alphabet.descend_seperator
-                for child in self.children[:-1]:
-                    result += child.as_standard_str() + Alphabet.level_seperator + " "
-                result +=  self.children[-1].as_standard_str() + Alphabet.ascend_seperator
+        return "".join(self.iter_standard())
 
-        return result
+# Leaf sets are shared, a formula mentions only a few distinct names
+singletons: dict[Any, frozenset] = {}
+
+def singleton(item: Any) -> frozenset:
+    result = singletons.get(item)
+    if result is None:
+        result = frozenset([item])
+        if len(singletons) < 1 << 16:
+            singletons[item] = result
+    return result
+
+def merged(sets: list[frozenset]) -> frozenset:
+    # The largest set is reused when the others add nothing to it, so the
+    # nodes along a long chain share one set instead of holding copies
+    if len(sets) == 1:
+        return sets[0]
+    largest = max(sets, key=len, default=frozenset())
+    for other in sets:
+        if not other <= largest:
+            return largest.union(*sets)
+    return largest
+
+def subtree_size(node: ExpressionTree, sizes: list[int]) -> int:
+    return 1 + sum(sizes)
+
+def subtree_quantifier_depth(node: ExpressionTree, depths: list[int]) -> int:
+    quantifier = node.value.startswith(Alphabet.forall) or node.value.startswith(Alphabet.exists)
+    return max(depths, default=0) + quantifier
+
+def subtree_free_variables(node: ExpressionTree, names: list[frozenset[str]]) -> frozenset[str]:
+    v = node.value
+    if v.startswith(Alphabet.forall) or v.startswith(Alphabet.exists):
+        free = merged(names)
+        return free - { v[1:] } if v[1:] in free else free
+    if not names:
+        return singleton(v)
+    return merged(names)
+
+def subtree_binding(node: ExpressionTree, bindings: list[tuple[frozenset[str], bool]]) -> tuple[frozenset[str], bool]:
+    """Variables some quantifier in the subtree binds, and whether one rebinds a variable already in its scope."""
+    bound = merged([names for names, _ in bindings])
+    rebinds = any(rebind for _, rebind in bindings)
+    v = node.value
+    if v.startswith(Alphabet.forall) or v.startswith(Alphabet.exists):
+        if v[1:] in bound:
+            return bound, True
+        return bound | singleton(v[1:]), rebinds
+    return bound, rebinds
+
+def subtree_top_level_quantified(node: ExpressionTree, names: list[frozenset[str]]) -> frozenset[str]:
+    """Variables bound by quantifiers reachable from node through connectives only."""
+    v = node.value
+    if v.startswith(Alphabet.forall) or v.startswith(Alphabet.exists):
+        return singleton(v[1:])
+    if v in [ Alphabet.negation, Alphabet.conjunction, Alphabet.disjunction ]:
+        return merged(names)
+    return frozenset()
+
+def push_arguments(stack: list, children: list[ExpressionTree], seperator: str):
+    # Pushed in reverse, so they pop as: first child, seperator, ..., last child, ")"
+    stack.append(Alphabet.ascend_seperator)
+    stack.append(children[-1])
+    for child in children[-2::-1]:
+        stack.append(seperator)
+        stack.append(child)
+
+# A node's value runs from after any leading spaces up to the next seperator
+PREFIX_VALUE = re.compile(r" *([^(),]*)")
+PREFIX_SPACES = re.compile(r" *")
 
 def parse_prefix_string(prefix_str: str) -> ExpressionTree:
-    i = 0
+    """
+        Parse with an explicit stack of nodes whose argument lists are still
+        open, so memory does not depend on the nesting depth of the formula.
+        The cyclic collector is paused while the tree is built: every node
+        links to its parent, and rescanning the growing tree would dominate
+        the parse time.
+    """
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        return parse_nodes(prefix_str)
+    finally:
+        if collecting:
+            gc.enable()
 
-    def parse():
-        nonlocal i
-        while i < len(prefix_str) and prefix_str[i] == " ":
-            i += 1
+def parse_nodes(prefix_str: str) -> ExpressionTree:
+    i = 0
+    n = len(prefix_str)
+    open_nodes = []
 
+    while True:
         # Read value
-        start = i
-        while i < len(prefix_str) and prefix_str[i] not in "(),":
+        match = PREFIX_VALUE.match(prefix_str, i)
+        i = match.end()
+        node = ExpressionTree(match.group(1), NO_CHILDREN, None)
+        if open_nodes:
+            open_nodes[-1].add_child(node)
+        else:
+            root = node
+
+        if i < n and prefix_str[i] == '(':
             i += 1
-        value = prefix_str[start:i]
+            open_nodes.append(node)
+            continue
 
-        node = ExpressionTree(value, [], None)
+        # The node is complete, close every argument list that ends here
+        while open_nodes:
+            i = PREFIX_SPACES.match(prefix_str, i).end()
+            if i >= n:
+                return root
+            if prefix_str[i] == ',':
+                i += 1
+                break
+            elif prefix_str[i] == ')':
+                i += 1
+                open_nodes.pop()
+            else:
+                break
+        else:
+            return root
 
-        while i < len(prefix_str) and prefix_str[i] == " ":
-            i += 1
+# Numbers the SharedNodes tables, so a hash-cons id is never reused by a later table
+shared_tables = itertools.count()
 
-        if i < len(prefix_str) and prefix_str[i] == '(':
+class SharedNodes:
+    """
+        Hash-consing constructor. Structurally equal subterms come back as the
+        same node, so a formula is stored as a DAG of its distinct subformulas
+        and equality (and hashing) of shared nodes is identity. Shared nodes
+        have no single parent and must not be mutated. Each carries its
+        hash-cons id, (table, index), as the "hash_cons" fact.
+    """
+    def __init__(self):
+        self.nodes: dict[tuple, ExpressionTree] = {}
+        self.table = next(shared_tables)
+
+    def node(self, value: str, children: list[ExpressionTree] = NO_CHILDREN) -> ExpressionTree:
+        # The children are shared already, so their ids stand for their structure
+        key = (value, *[id(c) for c in children])
+        shared = self.nodes.get(key)
+        if shared is None:
+            shared = ExpressionTree(value, list(children) if children else NO_CHILDREN, None)
+            shared.facts = { "hash_cons": (self.table, len(self.nodes)) }
+            self.nodes[key] = shared
+        return shared
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+def parse_shared(prefix_str: str, shared: SharedNodes) -> ExpressionTree:
+    """
+        parse_prefix_string into shared nodes. A node is only built once its
+        argument list is closed, so a repeated subformula allocates nothing.
+    """
+    i = 0
+    n = len(prefix_str)
+    open_nodes = []
+
+    while True:
+        match = PREFIX_VALUE.match(prefix_str, i)
+        i = match.end()
+        if i < n and prefix_str[i] == '(':
             i += 1
-            while True:
-                child = parse()
-                node.add_child(child)
-                while i < len(prefix_str) and prefix_str[i] == " ":
-                    i += 1
-                if i < len(prefix_str) and prefix_str[i] == ',':
-                    i += 1
-                elif i < len(prefix_str) and prefix_str[i] == ')':
-                    i += 1
-                    break
-        return node
+            open_nodes.append((match.group(1), []))
+            continue
+        node = shared.node(match.group(1))
 
-    return parse()
+        while open_nodes:
+            i = PREFIX_SPACES.match(prefix_str, i).end()
+            if i < n and prefix_str[i] == ',':
+                i += 1
+                open_nodes[-1][1].append(node)
+                break
+            elif i >= n or prefix_str[i] == ')':
+                # Unclosed argument lists at the end are closed as they stand
+                i += 1
+                value, children = open_nodes.pop()
+                children.append(node)
+                node = shared.node(value, children)
+            else:
+                open_nodes[-1][1].append(node)
+                break
+        else:
+            return node
 
 def get_expression_signature_and_variables(expression: ExpressionTree, signature_and_vars: dict[str, set[str]]):
     value = expression.value
@@ -230,69 +919,173 @@ def get_expression_signature_and_variables(expression: ExpressionTree, signature
         get_expression_signature_and_variables(child, signature_and_vars)
 
 def nnf_simplify(expression: ExpressionTree) -> ExpressionTree:
-    # Apply recursively to children first
-    for i in range(len(expression.children)):
-        expression.children[i] = nnf_simplify(expression.children[i])
-        expression.children[i].parent = expression
-
-    # === Implication (d): A → B → (!A | B)
-    if expression.value == Alphabet.implication:
-        not_A = ExpressionTree.not_expr()
-        not_A.child = expression.left
-        new_or = ExpressionTree.or_expr()
-        new_or.left = not_A
-        new_or.right = expression.right
-        return nnf_simplify(new_or)
-
-    # === Double Negation (a): !(!(A)) → A
-    if expression.value == Alphabet.negation:
-        inner = expression.child
-        if inner.value == Alphabet.negation:
-            return nnf_simplify(inner.child)
-
-        # === De Morgan’s Laws
-        # (b): !(A | B) → (!A & !B)
-        if inner.value == Alphabet.disjunction:
-            left = ExpressionTree.not_expr()
-            left.child = inner.left
-            right = ExpressionTree.not_expr()
-            right.child = inner.right
-            new_and = ExpressionTree.and_expr()
-            new_and.left = nnf_simplify(left)
-            new_and.right = nnf_simplify(right)
-            return new_and
-
-        # (c): !(A & B) → (!A | !B)
-        if inner.value == Alphabet.conjunction:
-            left = ExpressionTree.not_expr()
-            left.child = inner.left
-            right = ExpressionTree.not_expr()
-            right.child = inner.right
-            new_or = ExpressionTree.or_expr()
-            new_or.left = nnf_simplify(left)
-            new_or.right = nnf_simplify(right)
-            return new_or
+    """
+        Push negations down in one iterative pass. Each node is visited once
+        with a flag saying whether an odd number of negations lie above it:
+        negations are dropped, and the remaining nodes are rewritten in place
+        (implications become disjunctions of the negated left side, and under
+        a negation connectives and quantifiers turn into their duals).
+    """
+    dual = {
+        Alphabet.conjunction: Alphabet.disjunction,
+        Alphabet.disjunction: Alphabet.conjunction,
+        Alphabet.forall: Alphabet.exists,
+        Alphabet.exists: Alphabet.forall,
+    }
+    root = None
+    # Every node is rewritten or re-parented, so no cached analysis survives
+    expression.invalidate()
+    # (node, negated, node whose child it becomes, child index)
+    stack = [(expression, False, None, 0)]
+    while stack:
+        e, negated, owner, index = stack.pop()
+        while e.value == Alphabet.negation:
+            e = e.child
+            negated = not negated
+        e.facts = None
+        v = e.value
+
+        # === Implication (d): A → B → (!A | B), and !(A → B) → (A & !B)
+        if v == Alphabet.implication:
+            e.value = Alphabet.conjunction if negated else Alphabet.disjunction
+            stack.append((e.right, negated, e, 1))
+            stack.append((e.left, not negated, e, 0))
+
+        # === De Morgan’s Laws (b) and (c)
+        elif v in [ Alphabet.conjunction, Alphabet.disjunction ]:
+            if negated:
+                e.value = dual[v]
+            for i in range(len(e.children) - 1, -1, -1):
+                stack.append((e.children[i], negated, e, i))
 
         # === Quantifier negation (e) and (f)
-        if inner.value.startswith(Alphabet.forall):
-            var = inner.value[1:]
-            not_inner = ExpressionTree.not_expr()
-            not_inner.child = inner.child
-            exists_expr = ExpressionTree.exists_expr(var)
-            exists_expr.child = nnf_simplify(not_inner)
-            return exists_expr
-
-        if inner.value.startswith(Alphabet.exists):
-            var = inner.value[1:]
-            not_inner = ExpressionTree.not_expr()
-            not_inner.child = inner.child
-            forall_expr = ExpressionTree.forall_expr(var)
-            forall_expr.child = nnf_simplify(not_inner)
-            return forall_expr
-
-    return expression
+        elif v.startswith(Alphabet.forall) or v.startswith(Alphabet.exists):
+            if negated:
+                e.value = dual[v[0]] + v[1:]
+            stack.append((e.child, negated, e, 0))
+
+        # Atoms keep their negation, their terms are left as they are
+        else:
+            for i in range(len(e.children) - 1, -1, -1):
+                stack.append((e.children[i], False, e, i))
+            if negated:
+                not_e = ExpressionTree.not_expr()
+                not_e.child = e
+                e = not_e
+
+        if owner is None:
+            root = e
+        else:
+            owner.children[index] = e
+            e.parent = owner
+    return root
+
+def nnf_shared(expression: ExpressionTree, shared: SharedNodes) -> ExpressionTree:
+    """
+        nnf_simplify for shared nodes, without mutating them. Negations are
+        pushed down by polarity, and each distinct (subformula, polarity)
+        pair is rewritten once.
+    """
+    dual = {
+        Alphabet.conjunction: Alphabet.disjunction,
+        Alphabet.disjunction: Alphabet.conjunction,
+        Alphabet.forall: Alphabet.exists,
+        Alphabet.exists: Alphabet.forall,
+    }
+    # Shared nodes live as long as the table, so their ids stay unique
+    done = {}
+    stack = [(expression, False)]
+    while stack:
+        e, negated = stack[-1]
+        if (id(e), negated) in done:
+            stack.pop()
+            continue
+        v = e.value
+        quantifier = v[:1] in [ Alphabet.forall, Alphabet.exists ]
+        if v == Alphabet.negation:
+            parts = [(e.child, not negated)]
+        elif v == Alphabet.implication:
+            parts = [(e.left, not negated), (e.right, negated)]
+        elif v in [ Alphabet.conjunction, Alphabet.disjunction ] or quantifier:
+            parts = [(c, negated) for c in e.children]
+        else:
+            parts = []
+
+        pending = [part for part in parts if (id(part[0]), part[1]) not in done]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+
+        children = [done[id(c), n] for c, n in parts]
+        if v == Alphabet.negation:
+            result = children[0]
+        elif v == Alphabet.implication:
+            result = shared.node(Alphabet.conjunction if negated else Alphabet.disjunction, children)
+        elif quantifier:
+            result = shared.node(dual[v[0]] + v[1:] if negated else v, children)
+        elif v in [ Alphabet.conjunction, Alphabet.disjunction ]:
+            result = shared.node(dual[v] if negated else v, children)
+        else:
+            result = shared.node(Alphabet.negation, [e]) if negated else e
+        done[id(e), negated] = result
+    return done[id(expression), False]
+
+def miniscope(expression: ExpressionTree) -> ExpressionTree:
+    """
+        Push quantifiers of an NNF formula inward: @ distributes over &, # over |,
+        a quantifier moves past a side of the other connective that does not
+        mention its variable, and is dropped when its body does not mention it.
+        Only valid over a non-empty domain.
+    """
+    def push(quantifier: str, body: ExpressionTree) -> ExpressionTree:
+        var = quantifier[1:]
+        if var not in body.free_variables():
+            return body
+
+        universal = quantifier.startswith(Alphabet.forall)
+        distributes = Alphabet.conjunction if universal else Alphabet.disjunction
+        splits = Alphabet.disjunction if universal else Alphabet.conjunction
+        if body.value == distributes:
+            body.left = push(quantifier, body.left)
+            body.right = push(quantifier, body.right)
+            return body
+        if body.value == splits and var not in body.left.free_variables():
+            body.right = push(quantifier, body.right)
+            return body
+        if body.value == splits and var not in body.right.free_variables():
+            body.left = push(quantifier, body.left)
+            return body
+
+        node = ExpressionTree(quantifier, NO_CHILDREN, None)
+        node.add_child(body)
+        return node
+
+    def visit(e: ExpressionTree) -> ExpressionTree:
+        v = e.value
+        if v.startswith(Alphabet.forall) or v.startswith(Alphabet.exists):
+            return push(v, visit(e.child))
+        if v in [ Alphabet.negation, Alphabet.conjunction, Alphabet.disjunction ]:
+            e.invalidate()
+            for i in range(len(e.children)):
+                e.children[i] = visit(e.children[i])
+                e.children[i].parent = e
+        return e
+
+    result = visit(expression)
+    result.parent = None
+    return result
+
+# Marks a variable that had no binding before a quantifier bound it
+UNBOUND = object()
+
 def evaluate_expression(model: Model, expr: ExpressionTree, assignment: dict[str, str] = {}) -> bool:
-    def eval_expr(e: ExpressionTree, env: dict[str, str]) -> bool:
+    # Quantifiers bind in place instead of copying env. A quantifier's own last
+    # binding stays visible to later siblings, as before; the only others its
+    # body can leave behind are those of the body's top-level quantifiers, so
+    # just those are saved and restored after each iteration.
+
+    def eval_expr(e: ExpressionTree, env: dict[str, int]) -> bool:
         v = e.value
 
         if v == Alphabet.equality:
@@ -311,79 +1104,835 @@ def evaluate_expression(model: Model, expr: ExpressionTree, assignment: dict[str
 
         elif v.startswith(Alphabet.forall):
             var = v[1:]
-            for val in model.domain:
+            leaked = top_level_quantified(e.child)
+            if not leaked:
+                for val in model.domain_ids:
+                    env[var] = val
+                    if not eval_expr(e.child, env):
+                        return False
+                return True
+            others = tuple(leaked - { var })
+            saved = [env.get(name, UNBOUND) for name in others]
+            for val in model.domain_ids:
                 env[var] = val
-                if not eval_expr(e.child, env.copy()):
+                result = eval_expr(e.child, env)
+                restore(env, others, saved)
+                env[var] = val
+                if not result:
                     return False
             return True
 
         elif v.startswith(Alphabet.exists):
             var = v[1:]
-            for val in model.domain:
+            leaked = top_level_quantified(e.child)
+            if not leaked:
+                for val in model.domain_ids:
+                    env[var] = val
+                    if eval_expr(e.child, env):
+                        return True
+                return False
+            others = tuple(leaked - { var })
+            saved = [env.get(name, UNBOUND) for name in others]
+            for val in model.domain_ids:
+                env[var] = val
+                result = eval_expr(e.child, env)
+                restore(env, others, saved)
                 env[var] = val
-                if eval_expr(e.child, env.copy()):
+                if result:
                     return True
             return False
 
         else:
-            args = [eval_term(c, env) for c in e.children]
-            key = ",".join(args)
-            if len(args) == 0:
-                return v in model.interpretations and model.interpretations[v] == model.interpretations.get(key, key)
-            else:
-                return key in model.interpretations.get(v, [])
+            if len(e.children) == 0:
+                return model.proposition(v)
+            args = tuple([eval_term(c, env) for c in e.children])
+            return model.relation(v, len(args)).holds(args)
 
-    def eval_term(e: ExpressionTree, env: dict[str, str]) -> str:
+    def eval_term(e: ExpressionTree, env: dict[str, int]) -> int:
         v = e.value
         if len(e.children) == 0:
             if v in env:
                 return env[v]
-            elif v in model.interpretations:
-                return model.interpretations[v]
-            return v
+            return model.constant(v)
+        else:
+            args = tuple([eval_term(c, env) for c in e.children])
+            return model.function(v, len(args)).apply(args)
+
+    return eval_expr(expr, model.bind(assignment))
+
+# Number of compiled formulas kept per model, keyed by prefix string
+COMPILE_CACHE_SIZE = 128
+
+def compile_term(model: Model, e: ExpressionTree) -> Callable[[dict[str, int]], int]:
+    v = e.value
+
+    if len(e.children) == 0:
+        fallback = model.constant(v)
+        return lambda env: env.get(v, fallback)
+
+    args = [compile_term(model, c) for c in e.children]
+    table = model.function(v, len(args))
+    if not isinstance(table, FunctionTable):
+        return lambda env: table.apply(tuple([arg(env) for arg in args]))
+    values, size = table.values, table.size
+    if len(args) == 1:
+        a, = args
+        def unary(env):
+            i = a(env)
+            result = values[i] if i < size else -1
+            return result if result >= 0 else table.apply((i,))
+        return unary
+    if len(args) == 2:
+        a, b = args
+        def binary(env):
+            i, j = a(env), b(env)
+            result = values[i * size + j] if i < size and j < size else -1
+            return result if result >= 0 else table.apply((i, j))
+        return binary
+    return lambda env: table.apply(tuple([arg(env) for arg in args]))
+
+def compile_atom(model: Model, v: str, children: list[ExpressionTree]) -> Callable[[dict[str, int]], bool]:
+    args = [compile_term(model, c) for c in children]
+    relation = model.relation(v, len(args))
+    if isinstance(relation, Relation):
+        index, others, size = relation.index, relation.others, relation.size
+        if len(args) == 1:
+            a, = args
+            def unary(env):
+                i = a(env)
+                return i in index if i < size else (i,) in others
+            return unary
+        if len(args) == 2:
+            a, b = args
+            def binary(env):
+                i, j = a(env), b(env)
+                return i * size + j in index if i < size and j < size else (i, j) in others
+            return binary
+    return lambda env: relation.holds(tuple([arg(env) for arg in args]))
+
+def compile_expression(model: Model, e: ExpressionTree, memo: 'Memo' = None,
+                       nodes: dict[int, Callable] = None) -> Callable[[dict[str, int]], bool]:
+    """
+        Turn expr into nested closures once, so the node type is not worked
+        out again for every assignment. Behaves exactly like evaluate_expression.
+        With nodes, a node reached twice (a SharedNodes DAG) is compiled once.
+    """
+    if nodes is not None and id(e) in nodes:
+        return nodes[id(e)]
+    compiled = compile_formula(model, e, memo, nodes)
+    if memo is not None and id(e) in memo.plan:
+        compiled = memoise(compiled, memo.cache, memo.plan[id(e)])
+    if nodes is not None:
+        nodes[id(e)] = compiled
+    return compiled
+
+def compile_formula(model: Model, e: ExpressionTree, memo: 'Memo',
+                    nodes: dict[int, Callable] = None) -> Callable[[dict[str, int]], bool]:
+    v = e.value
+
+    if v == Alphabet.equality:
+        left = compile_term(model, e.left)
+        right = compile_term(model, e.right)
+        return lambda env: left(env) == right(env)
+
+    elif v == Alphabet.negation:
+        child = compile_expression(model, e.child, memo, nodes)
+        return lambda env: not child(env)
+
+    elif v == Alphabet.conjunction:
+        left = compile_expression(model, e.left, memo, nodes)
+        right = compile_expression(model, e.right, memo, nodes)
+        return lambda env: left(env) and right(env)
+
+    elif v == Alphabet.disjunction:
+        left = compile_expression(model, e.left, memo, nodes)
+        right = compile_expression(model, e.right, memo, nodes)
+        return lambda env: left(env) or right(env)
+
+    elif v.startswith(Alphabet.forall) or v.startswith(Alphabet.exists):
+        return compile_quantifier(model, e, memo, nodes)
+
+    if len(e.children) == 0:
+        result = model.proposition(v)
+        return lambda env: result
+
+    return compile_atom(model, v, e.children)
+
+def top_level_quantified(e: ExpressionTree) -> frozenset[str]:
+    """Variables bound by quantifiers reachable from e through connectives only."""
+    return e.analysis("top_level_quantified", subtree_top_level_quantified)
+
+def restore(env: dict[str, int], names: tuple[str, ...], saved: list[Any]):
+    for name, old in zip(names, saved):
+        if old is UNBOUND:
+            env.pop(name, None)
         else:
-            args = [eval_term(c, env) for c in e.children]
-            key = ",".join(args)
-            return model.interpretations[v][key]
+            env[name] = old
+
+def compile_quantifier(model: Model, e: ExpressionTree, memo: 'Memo',
+                       nodes: dict[int, Callable] = None) -> Callable[[dict[str, int]], bool]:
+    """
+        Quantifiers bind their variable in place. The only other bindings the
+        body can leave behind are those of its own top-level quantifiers, which
+        are known here, so they are saved once and restored after each iteration.
+    """
+    var = e.value[1:]
+    child = compile_expression(model, e.child, memo, nodes)
+    domain = model.domain_ids
+    leaked = top_level_quantified(e.child)
+    shadows = var in leaked
+    others = tuple(leaked - { var })
+
+    if e.value.startswith(Alphabet.forall):
+        if not leaked:
+            def forall(env):
+                for val in domain:
+                    env[var] = val
+                    if not child(env):
+                        return False
+                return True
+            return forall
+
+        def forall_restoring(env):
+            saved = [env.get(name, UNBOUND) for name in others]
+            for val in domain:
+                env[var] = val
+                result = child(env)
+                restore(env, others, saved)
+                if shadows:
+                    env[var] = val
+                if not result:
+                    return False
+            return True
+        return forall_restoring
+
+    if not leaked:
+        def exists(env):
+            for val in domain:
+                env[var] = val
+                if child(env):
+                    return True
+            return False
+        return exists
+
+    def exists_restoring(env):
+        saved = [env.get(name, UNBOUND) for name in others]
+        for val in domain:
+            env[var] = val
+            result = child(env)
+            restore(env, others, saved)
+            if shadows:
+                env[var] = val
+            if result:
+                return True
+        return False
+    return exists_restoring
+
+def compile_cached(model: Model, expr: ExpressionTree, memoised: bool = False) -> Callable[[dict[str, int]], bool]:
+    # A shared node is keyed by its hash-cons id, printing it would expand the whole DAG
+    hash_cons = expr.facts.get("hash_cons") if expr.facts is not None else None
+    key = (hash_cons or expr.as_prefix_str(), memoised)
+    if key in model.compiled:
+        model.compiled.move_to_end(key)
+        return model.compiled[key]
+    memo = None
+    if memoised and not binding_leaks(expr):
+        if model.memo is None:
+            model.memo = SubformulaCache()
+        memo = Memo(model.memo, plan_memo(expr))
+    compiled = compile_expression(model, expr, memo, {})
+    model.compiled[key] = compiled
+    if len(model.compiled) > COMPILE_CACHE_SIZE:
+        model.compiled.popitem(last=False)
+    return compiled
+
+def evaluate_compiled(model: Model, expr: ExpressionTree, assignment: dict[str, str] = {}) -> bool:
+    return compile_cached(model, expr)(model.bind(assignment))
+
+# Memoisation cache budget, and a rough size of one cached entry
+MEMO_MAX_BYTES = 64 * 2**20
+MEMO_ENTRY_BYTES = 160
+# Subformulas smaller than this are only memoised when they contain a quantifier
+MEMO_MIN_NODES = 8
+
+class SubformulaCache:
+    """Bounded LRU of subformula truth values with hit/miss counters."""
+    def __init__(self, max_bytes: int = MEMO_MAX_BYTES):
+        self.capacity = max(1, max_bytes // MEMO_ENTRY_BYTES)
+        self.entries: OrderedDict[tuple, bool] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> bool | None:
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return result
+
+    def put(self, key: tuple, result: bool):
+        self.entries[key] = result
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+class Memo:
+    """Which nodes of one formula are memoised, keyed by which free variables."""
+    def __init__(self, cache: SubformulaCache, plan: dict[int, tuple[Any, tuple[str, ...]]]):
+        self.cache = cache
+        self.plan = plan
+
+def binding_leaks(expr: ExpressionTree) -> bool:
+    """
+        True if a quantifier's leftover binding can be observed: some quantifier
+        rebinds a variable already in scope, or a bound name also occurs free.
+    """
+    bound, rebinds = expr.analysis("binding", subtree_binding)
+    return rebinds or not bound.isdisjoint(expr.free_variables())
+
+def plan_memo(expr: ExpressionTree) -> dict[int, tuple[Any, tuple[str, ...]]]:
+    """
+        Choose the subformulas worth memoising: those that do not depend on
+        some enclosing quantified variable, and are either large or quantified.
+        Each maps to a unique token and the free variables its result depends on.
+        Sizes, free variables and quantifiers come from the cached analyses, so
+        only the formula levels are walked here, to track the scope.
+    """
+    plan = {}
+    stack = [(expr, frozenset())]
+    while stack:
+        e, scope = stack.pop()
+        v = e.value
+        free = e.free_variables()
+        if (e.quantifier_depth() > 0 or e.size() >= MEMO_MIN_NODES) and not scope <= free:
+            plan[id(e)] = (object(), tuple(sorted(free)))
+        if v.startswith(Alphabet.forall) or v.startswith(Alphabet.exists):
+            stack.append((e.child, scope | { v[1:] }))
+        elif v in [ Alphabet.negation, Alphabet.conjunction, Alphabet.disjunction ]:
+            stack.extend((c, scope) for c in e.children)
+    return plan
+
+def memoise(compiled: Callable[[dict[str, int]], bool], cache: SubformulaCache,
+            entry: tuple[Any, tuple[str, ...]]) -> Callable[[dict[str, int]], bool]:
+    token, names = entry
+
+    def memoised(env):
+        key = (token, *[env.get(name, UNBOUND) for name in names])
+        result = cache.get(key)
+        if result is None:
+            result = compiled(env)
+            cache.put(key, result)
+        return result
+    return memoised
+
+def evaluate_memoised(model: Model, expr: ExpressionTree, assignment: dict[str, str] = {}) -> bool:
+    """
+        Compiled evaluation with subformula memoisation, for deeply quantified
+        formulas. Formulas where memoising could change the result run unmemoised.
+    """
+    return compile_cached(model, expr, memoised=True)(model.bind(assignment))
+
+# Largest tensor (in cells) the numpy backend will materialise before falling back
+NUMPY_MAX_CELLS = 1 << 24
+
+class Unvectorisable(Exception):
+    """The formula or model has no array form that matches the tree walker exactly."""
+
+def function_table(model: Model, name: str, arity: int):
+    """Integer array of shape domain^arity holding the id of f(a, b, ...)."""
+    if model.size ** arity > NUMPY_MAX_CELLS:
+        raise Unvectorisable(f"{name} has too many tuples of arity {arity} for this domain")
+    if ("function", name, arity) not in model.tables:
+        n = model.size
+        function = model.function(name, arity)
+        table = None
+        # A sparse table is never total, so only the dense array is viewed
+        if isinstance(function, FunctionTable) and function.size == n and isinstance(function.values, array):
+            table = np.frombuffer(function.values, dtype=np.int64).reshape((n,) * arity)
+            # The walker raises on a missing entry, so only total functions are vectorised
+            if (table < 0).any() or (table >= n).any():
+                table = None
+        model.tables[("function", name, arity)] = table
+    table = model.tables[("function", name, arity)]
+    if table is None:
+        raise Unvectorisable(f"{name} is not a total function of arity {arity}")
+    return table
 
-    return eval_expr(expr, assignment.copy())
-    def eval_term(e: ExpressionTree, env: dict[str, str]) -> str:
+def relation_table(model: Model, name: str, arity: int):
+    """Boolean array of shape domain^arity, true where the tuple is in the relation."""
+    if model.size ** arity > NUMPY_MAX_CELLS:
+        raise Unvectorisable(f"{name} has too many tuples of arity {arity} for this domain")
+    if ("relation", name, arity) not in model.tables:
+        n = model.size
+        relation = model.relation(name, arity)
+        table = None
+        if isinstance(relation, Relation):
+            index = relation.index
+            if isinstance(index, BitsetIndex):
+                table = np.unpackbits(np.frombuffer(index.bits, dtype=np.uint8), bitorder="little")[:n ** arity]
+                table = table.astype(bool)
+            elif isinstance(index, ComplementIndex):
+                table = np.ones(n ** arity, dtype=bool)
+                table[list(index.missing)] = False
+            elif isinstance(index, HashSetIndex):
+                table = np.zeros(n ** arity, dtype=bool)
+                table[list(index.positions)] = True
+            else:
+                table = np.fromiter((position in index for position in range(n ** arity)), dtype=bool, count=n ** arity)
+            table = table.reshape((n,) * arity)
+        model.tables[("relation", name, arity)] = table
+    table = model.tables[("relation", name, arity)]
+    if table is None:
+        raise Unvectorisable(f"{name} is not a relation")
+    return table
+
+def quantified_variables(expr: ExpressionTree) -> tuple[frozenset[str], int]:
+    """Variables bound anywhere in expr and the deepest quantifier nesting."""
+    bound, _ = expr.analysis("binding", subtree_binding)
+    return bound, expr.quantifier_depth()
+
+def vectorise(model: Model, expr: ExpressionTree, assignment: dict[str, str]) -> bool:
+    """
+        Evaluate every subformula to a boolean tensor over the quantifier nesting
+        levels: axis k holds the variable bound by the k-th enclosing quantifier.
+        Quantifiers become all/any reductions and terms become fancy indexing.
+    """
+    n = model.size
+    if not model.domain:
+        raise Unvectorisable("quantifiers over an empty domain are not reductions")
+    quantified, rank = quantified_variables(expr)
+    if n ** rank > NUMPY_MAX_CELLS:
+        raise Unvectorisable("formula is too deeply quantified for this domain")
+    ones = (1,) * rank
+
+    def axis_values(axis: int):
+        shape = [1] * rank
+        shape[axis] = n
+        return np.arange(n).reshape(shape)
+
+    def constant(name: str):
+        # The walker leaks quantifier bindings to later siblings, so such names stay scalar-only
+        if name in quantified:
+            raise Unvectorisable(f"{name} occurs free and bound")
+        value = model.intern(assignment[name]) if name in assignment else model.constant(name)
+        if value >= n:
+            raise Unvectorisable(f"{name} does not denote a domain element")
+        return np.full(ones, value, dtype=np.intp)
+
+    def term(e: ExpressionTree, scope: dict[str, int]):
+        if len(e.children) == 0:
+            if e.value in scope:
+                return axis_values(scope[e.value])
+            return constant(e.value)
+        args = tuple(term(c, scope) for c in e.children)
+        return function_table(model, e.value, len(args))[args]
+
+    def tensor(e: ExpressionTree, scope: dict[str, int], depth: int):
         v = e.value
+
+        if v == Alphabet.equality:
+            return term(e.left, scope) == term(e.right, scope)
+
+        elif v == Alphabet.negation:
+            return ~tensor(e.child, scope, depth)
+
+        elif v == Alphabet.conjunction:
+            return tensor(e.left, scope, depth) & tensor(e.right, scope, depth)
+
+        elif v == Alphabet.disjunction:
+            return tensor(e.left, scope, depth) | tensor(e.right, scope, depth)
+
+        elif v.startswith(Alphabet.forall) or v.startswith(Alphabet.exists):
+            # A shadowing quantifier's last binding leaks to its later siblings in the walker
+            if v[1:] in scope:
+                raise Unvectorisable(f"{v[1:]} is rebound inside its own scope")
+            inner = tensor(e.child, { **scope, v[1:]: depth }, depth + 1)
+            if v.startswith(Alphabet.forall):
+                return inner.all(axis=depth, keepdims=True)
+            return inner.any(axis=depth, keepdims=True)
+
         if len(e.children) == 0:
-            # Constant or variable
-            if v in env:
-                return env[v]
-            elif v in model.interpretations:
-                return model.interpretations[v]
-            return v
-        else:
-            # Function
-            args = [eval_term(c, env) for c in e.children]
-            key = ",".join(args)
-            return model.interpretations[v][key]
+            interpretations = model.interpretations
+            result = v in interpretations and interpretations[v] == interpretations.get("", "")
+            return np.full(ones, result, dtype=bool)
+
+        args = tuple(term(c, scope) for c in e.children)
+        return relation_table(model, v, len(args))[args]
 
-    return eval_expr(expr, assignment.copy())
+    return bool(tensor(expr, {}, 0).reshape(-1)[0])
 
+def evaluate_numpy(model: Model, expr: ExpressionTree, assignment: dict[str, str] = {}) -> bool:
+    """
+        Vectorised backend for large domains. Falls back to the compiled
+        evaluator when numpy is missing or the formula cannot be vectorised.
+    """
+    if np is not None:
+        try:
+            return vectorise(model, expr, assignment)
+        except Unvectorisable:
+            pass
+    return evaluate_compiled(model, expr, assignment)
 
 def load_model(json_str: str) -> 'Model':
-    data = json.loads(json_str)
-    model = Model()
-    model.domain = data['domain']
-    model.interpretations = data['interpretations']
-    return model
+    return Model.from_json(json_str)
 
-def main():
-    model_str = input().strip()
-    model = Model.from_json(model_str)
+# Part B: the formulas of B/q1.py-B/q7.py built as shared nodes, so a machine
+# can be checked against a model without printing phi_M and parsing it again
+# ========================================================================================================================
+
+# Mirror B/q7.py's --balanced, --exactly-one and --factored-frame options. q4 has
+# no such flags; these are module globals that callers such as TestMachine.py set
+balanced = False
+exactly_one = "pairwise"
+factored_frame = False
+
+def unshared(expression: ExpressionTree) -> ExpressionTree:
+    """A parent-linked copy of a SharedNodes DAG, for the passes that rewrite in place."""
+    root = ExpressionTree(expression.value, NO_CHILDREN, None)
+    stack = [(expression, root)]
+    while stack:
+        node, copy = stack.pop()
+        for child in node.children:
+            child_copy = ExpressionTree(child.value, NO_CHILDREN, None)
+            copy.add_child(child_copy)
+            stack.append((child, child_copy))
+    return root
+
+def fold(nodes: SharedNodes, connective: str, formulas: list[ExpressionTree]) -> ExpressionTree:
+    # Left-deep, as B/q7.py's build_conjunction: &(&(a,b),c); no formulas leaves an empty node
+    if not formulas:
+        return nodes.node("")
+    if balanced:
+        return balanced_fold(nodes, connective, formulas, 0, len(formulas))
+    result = formulas[0]
+    for formula in formulas[1:]:
+        result = nodes.node(connective, [result, formula])
+    return result
+
+def balanced_fold(nodes: SharedNodes, connective: str, formulas: list[ExpressionTree], lo: int, hi: int) -> ExpressionTree:
+    # As B/q7.py's balanced_pieces: &(&(a,b),&(c,d)), the first half on the left
+    if hi - lo == 1:
+        return formulas[lo]
+    mid = lo + (hi - lo + 1) // 2
+    return nodes.node(connective, [balanced_fold(nodes, connective, formulas, lo, mid), balanced_fold(nodes, connective, formulas, mid, hi)])
+
+def negated(nodes: SharedNodes, atoms: list[ExpressionTree]) -> list[ExpressionTree]:
+    return [nodes.node("!", [atom]) for atom in atoms]
+
+def bisection_formula(nodes: SharedNodes, atoms: list[ExpressionTree], lo: int, hi: int) -> ExpressionTree:
+    # As B/q7.py's bisection: the true atom is in one half and the other half is all false
+    if hi - lo == 1:
+        return atoms[lo]
+    n = nodes.node
+    mid = lo + (hi - lo + 1) // 2
+    left_none = fold(nodes, "&", negated(nodes, atoms[lo:mid]))
+    right_none = fold(nodes, "&", negated(nodes, atoms[mid:hi]))
+    return n("|", [
+        n("&", [bisection_formula(nodes, atoms, lo, mid), right_none]),
+        n("&", [left_none, bisection_formula(nodes, atoms, mid, hi)]),
+    ])
+
+def ladder_formula(nodes: SharedNodes, atoms: list[ExpressionTree], counters: list[ExpressionTree]) -> ExpressionTree:
+    # As B/q7.py's ladder: at least one atom, and at most one through the counters
+    n = nodes.node
+    clauses = []
+    for i in range(len(atoms)):
+        if i < len(atoms) - 1:
+            clauses.append(n(">", [atoms[i], counters[i]]))
+        if 0 < i < len(atoms) - 1:
+            clauses.append(n(">", [counters[i - 1], counters[i]]))
+        if i > 0:
+            clauses.append(n(">", [atoms[i], n("!", [counters[i - 1]])]))
+    if not clauses:
+        return atoms[0]
+    return n("&", [fold(nodes, "|", atoms), fold(nodes, "&", clauses)])
+
+def exactly_one_formula(nodes: SharedNodes, predicate: str, arguments: list[ExpressionTree], count: int) -> ExpressionTree:
+    """Exactly one of predicate[0..count) holds of arguments, in the exactly_one encoding."""
+    n = nodes.node
+    atoms = [n(f"{predicate}[{i}]", arguments) for i in range(count)]
+    if not atoms:
+        return n("")
+    if exactly_one == "bisection":
+        return bisection_formula(nodes, atoms, 0, count)
+    if exactly_one == "ladder":
+        return ladder_formula(nodes, atoms, [n(f"{predicate}L[{i}]", arguments) for i in range(count - 1)])
+    terms = []
+    for i in range(count):
+        term = atoms[i]
+        if count > 1:
+            term = n("&", [term, fold(nodes, "&", negated(nodes, atoms[:i] + atoms[i + 1:]))])
+        terms.append(term)
+    return fold(nodes, "|", terms)
 
+def construct_empty_formula(M: TuringMachine, nodes: SharedNodes = None) -> ExpressionTree:
+    nodes = SharedNodes() if nodes is None else nodes
+    n = nodes.node
+    s0 = s1 = None
+    for state, read, _, write, _ in M.transitions:
+        if state == M.initial_state:
+            if read == 0:
+                s0 = f"S[{write}]"
+            elif read == 1:
+                s1 = f"S[{write}]"
+    s0 = s0 or "S[0]"
+    s1 = s1 or "S[1]"
+    zero, one, x = n("0"), n("1"), n("x")
+    start = n("&", [n(f"Q[{M.initial_state}]", [zero]), n("C", [zero, one])])
+    tape = n("&", [n(s1, [zero, zero]), n("@x", [n(">", [n("!", [n("=", [x, zero])]), n(s0, [zero, x])])])])
+    return n("&", [start, tape])
+
+def construct_state_formula(M: TuringMachine, nodes: SharedNodes = None) -> ExpressionTree:
+    nodes = SharedNodes() if nodes is None else nodes
+    n = nodes.node
+    return n("@x", [exactly_one_formula(nodes, "Q", [n("x")], len(M.states))])
+
+def construct_symbol_formula(M: TuringMachine, nodes: SharedNodes = None) -> ExpressionTree:
+    nodes = SharedNodes() if nodes is None else nodes
+    n = nodes.node
+    return n("@x", [n("@y", [exactly_one_formula(nodes, "S", [n("x"), n("y")], len(M.alphabet))])])
+
+def construct_cell_formula(M: TuringMachine, nodes: SharedNodes = None) -> ExpressionTree:
+    nodes = SharedNodes() if nodes is None else nodes
+    n = nodes.node
+    x, y, z = n("x"), n("y"), n("z")
+    unique = n("@z", [n(">", [n("C", [x, z]), n("=", [z, y])])])
+    return n("@x", [n("#y", [n("&", [n("C", [x, y]), unique])])])
+
+def construct_transitions_formula(M: TuringMachine, nodes: SharedNodes = None) -> ExpressionTree:
+    nodes = SharedNodes() if nodes is None else nodes
+    n = nodes.node
+    x, y, z, v = n("x"), n("y"), n("z"), n("v")
+    sx = n("s", [x])
+    # Every cell but the head's keeps its symbol; the same block for every transition
+    kept = fold(nodes, "&", [
+        n(">", [n(f"S[{k}]", [x, z]), n(f"S[{k}]", [sx, z])]) for k in range(len(M.alphabet))
+    ])
+    preserved = n("@z", [n(">", [n("!", [n("=", [z, y])]), kept])])
+    moved_left = n("#v", [n("&", [n("=", [n("s", [v]), y]), n("C", [sx, v])])])
+    moved_right = n("C", [sx, n("s", [y])])
+
+    formulas = []
+    for state, read, next_state, write, direction in M.transitions:
+        antecedent = fold(nodes, "&", [n(f"Q[{state}]", [x]), n("C", [x, y]), n(f"S[{read}]", [x, y])])
+        moved = moved_left if direction == -1 else moved_right
+        step = fold(nodes, "&", [n(f"Q[{next_state}]", [sx]), moved, n(f"S[{write}]", [sx, y])])
+        consequent = step if factored_frame else n("&", [step, preserved])
+        formulas.append(n("@x", [n("@y", [n(">", [antecedent, consequent])])]))
+    if factored_frame and formulas:
+        # As B/q7.py's phi_frame: the block stated once, wherever some transition applies
+        guards = dict.fromkeys(n("&", [n(f"Q[{state}]", [x]), n(f"S[{read}]", [x, y])]) for state, read, *_ in M.transitions)
+        applies = n("&", [n("C", [x, y]), fold(nodes, "|", list(guards))])
+        formulas.append(n("@x", [n("@y", [n(">", [applies, preserved])])]))
+    return fold(nodes, "&", formulas)
+
+def construct_halt_formula(M: TuringMachine, nodes: SharedNodes = None) -> ExpressionTree:
+    nodes = SharedNodes() if nodes is None else nodes
+    n = nodes.node
+    x = n("x")
+    if len(M.states) > 2:
+        return n("#x", [n("|", [n("Q[1]", [x]), n("Q[2]", [x])])])
+    if len(M.states) > 1:
+        return n("#x", [n("Q[1]", [x])])
+    return n("#x", [n("Q[0]", [x])])
+
+def construct_machine_formula(M: TuringMachine, nodes: SharedNodes = None) -> ExpressionTree:
+    nodes = SharedNodes() if nodes is None else nodes
+    premises = fold(nodes, "&", [
+        construct_empty_formula(M, nodes),
+        construct_state_formula(M, nodes),
+        construct_symbol_formula(M, nodes),
+        construct_cell_formula(M, nodes),
+        construct_transitions_formula(M, nodes),
+    ])
+    return nodes.node(">", [premises, construct_halt_formula(M, nodes)])
+
+def evaluate_machine_formula(model: Model, M: TuringMachine) -> bool:
+    """
+        Whether phi_M holds in model. The formula is built as shared nodes,
+        put in NNF and compiled once per distinct subformula.
+    """
+    shared = SharedNodes()
+    expr = nnf_shared(construct_machine_formula(M, shared), shared)
+    return compile_expression(model, expr, None, {})(model.bind({}))
+
+class HistoryIndex:
+    """
+        Membership of (time, cell) in a tape relation, by mixed-radix position:
+        whether the cell holds one of symbols at that time. Read from the
+        History, so the size^2 pairs are never listed.
+    """
+    def __init__(self, history: History, size: int, symbols: range):
+        self.history = history
+        self.size = size
+        self.symbols = symbols
+
+    def __contains__(self, position: int) -> bool:
+        time, cell = divmod(position, self.size)
+        return self.history.symbol(time, cell) in self.symbols
+
+def history_model(M: TuringMachine, history: History) -> Model:
+    """
+        The run as a structure over phi_M's vocabulary. The domain 0..k+1
+        serves as both times and cells, s is the successor (the last element
+        is its own), Q[i](t) holds when the state at t is i, C(t, c) when the
+        head is on c and S[j](t, c) when c holds j. The counters of the
+        ladder encoding, QL[i] and SL[i], hold once the state or symbol is at
+        most i. Built straight into the evaluator's tables.
+    """
+    size = len(history.states) + 1
+    last = len(history.states) - 1
+    successor = FunctionTable(size, 1)
+    successor.values = array("q", range(1, size + 1))
+    successor.values[-1] = size - 1
+
+    states = [history.states[min(t, last)] for t in range(size)]
+    heads = [history.heads[min(t, last)] for t in range(size)]
+    relations = { "C": (2, index_predicate(size * size, { t * size + heads[t] for t in range(size) })) }
+    for i in range(len(M.states)):
+        relations[f"Q[{i}]"] = (1, index_predicate(size, { t for t in range(size) if states[t] == i }))
+        relations[f"QL[{i}]"] = (1, index_predicate(size, { t for t in range(size) if states[t] <= i }))
+    for j in range(len(M.alphabet)):
+        relations[f"S[{j}]"] = (2, HistoryIndex(history, size, range(j, j + 1)))
+        relations[f"SL[{j}]"] = (2, HistoryIndex(history, size, range(j + 1)))
+    predicates = { (name, arity): Relation(size, arity, index, set()) for name, (arity, index) in relations.items() }
+    return Model.from_tables([str(i) for i in range(size)], { "0": "0", "1": "1" }, { ("s", 1): successor }, predicates)
+
+def history_model_json(M: TuringMachine, history: History) -> str:
+    """history_model written out in the model_format.json shape, which lists all size^2 tape pairs."""
+    model = history_model(M, history)
+    domain = model.domain
+    interpretations = {
+        "s": { d: domain[model.functions[("s", 1)].values[i]] for i, d in enumerate(domain) },
+        "0": "0",
+        "1": "1",
+    }
+    for (name, arity), relation in model.predicates.items():
+        interpretations[name] = [
+            domain[position] if arity == 1 else f"{domain[position // model.size]},{domain[position % model.size]}"
+            for position in range(model.size ** arity) if position in relation.index
+        ]
+    return json.dumps({ "domain": domain, "interpretations": interpretations })
+
+BACKENDS = {
+    "walk": evaluate_expression,
+    "compiled": evaluate_compiled,
+    "numpy": evaluate_numpy,
+    "memo": evaluate_memoised,
+}
+
+# Set before the worker pool forks, so workers inherit the loaded model
+# instead of receiving a pickled copy with every task
+worker_model: Model = None
+worker_evaluate: Callable[[Model, ExpressionTree], bool] = None
+worker_share = False
+worker_nodes: SharedNodes = None
+
+# Under --share one table serves every formula, so a repeated formula is the
+# same node and hits the compile cache; past this many nodes it starts over
+SHARED_MAX_NODES = 1 << 20
+
+def check_formula(line: str) -> str:
+    global worker_nodes
+    if worker_share:
+        if worker_nodes is None or len(worker_nodes) > SHARED_MAX_NODES:
+            worker_nodes = SharedNodes()
+        # Miniscoping rewrites nodes in place, which shared nodes cannot allow
+        expr = nnf_shared(parse_shared(line, worker_nodes), worker_nodes)
+        return "T" if worker_evaluate(worker_model, expr) else "F"
+    expr = parse_prefix_string(line)
+    expr = nnf_simplify(expr)  # Optional simplification
+    # Quantifier scopes are only observable through leaked bindings, and only
+    # an empty domain tells @x(A) apart from A when x does not occur in A
+    if worker_model.domain and not binding_leaks(expr):
+        expr = miniscope(expr)
+    return "T" if worker_evaluate(worker_model, expr) else "F"
+
+def check_formula_counted(line: str) -> tuple[str, int, int, int]:
+    """check_formula, and the hits, misses and entries it added to this worker's memo cache."""
+    memo = worker_model.memo
+    hits, misses, entries = memo.hits, memo.misses, len(memo.entries)
+    result = check_formula(line)
+    return result, memo.hits - hits, memo.misses - misses, len(memo.entries) - entries
+
+# Streaming mode reads and writes in blocks of this many bytes
+STREAM_BLOCK_SIZE = 1 << 20
+
+def stream_lines(stream=None):
+    """Yield the stripped lines of stdin, read in large blocks rather than one input() per line."""
+    stream = stream or sys.stdin.buffer
+    pending = b""
     while True:
-        line = input().strip()
+        block = stream.read(STREAM_BLOCK_SIZE)
+        if not block:
+            break
+        lines = (pending + block).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.decode().strip()
+    if pending:
+        yield pending.decode().strip()
+
+def stream_writer():
+    """A single block-buffered writer over stdout; flush it once at the end."""
+    sys.stdout.flush()
+    return open(sys.stdout.fileno(), "w", buffering=STREAM_BLOCK_SIZE, closefd=False)
+
+def read_formulas(lines):
+    for line in lines:
+        line = line.strip()
         if line == "done":
             break
-        expr = parse_prefix_string(line)
-        expr = nnf_simplify(expr)  # Optional simplification
-        result = evaluate_expression(model, expr)
-        print("T" if result else "F")
+        yield line
+
+def main():
+    global worker_model, worker_evaluate, worker_share
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=BACKENDS, default="compiled")
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes for batch evaluation")
+    parser.add_argument("--memo-mb", type=float, default=MEMO_MAX_BYTES / 2**20, help="memo backend cache cap")
+    parser.add_argument("--memo-stats", action="store_true", help="report memo cache hits/misses on stderr")
+    parser.add_argument("--stream", action="store_true", help="block-buffered stdin/stdout for large batches")
+    parser.add_argument("--share", action="store_true", help="store each formula as a DAG of distinct subformulas")
+    args = parser.parse_args()
+    worker_evaluate = BACKENDS[args.backend]
+    worker_share = args.share
+
+    lines = stream_lines() if args.stream else iter(input, None)
+    out = stream_writer() if args.stream else sys.stdout
+    emit = lambda result: out.write(result + "\n")
+
+    model_str = next(lines).strip()
+    worker_model = Model.from_json(model_str)
+    worker_model.memo = SubformulaCache(int(args.memo_mb * 2**20))
+
+    memo = worker_model.memo
+    counts = [memo.hits, memo.misses, len(memo.entries)]
+    pooled = args.jobs > 1 and "fork" in multiprocessing.get_all_start_methods()
+    if pooled:
+        formulas = list(read_formulas(lines))
+        chunksize = max(1, len(formulas) // (args.jobs * 8))
+        with multiprocessing.get_context("fork").Pool(args.jobs) as pool:
+            # imap hands results back in input order
+            if args.memo_stats:
+                # Worker processes keep their own caches, so each result carries what it added
+                for result, *added in pool.imap(check_formula_counted, formulas, chunksize):
+                    counts = [count + more for count, more in zip(counts, added)]
+                    emit(result)
+            else:
+                for result in pool.imap(check_formula, formulas, chunksize):
+                    emit(result)
+    else:
+        for line in read_formulas(lines):
+            emit(check_formula(line))
+        counts = [memo.hits, memo.misses, len(memo.entries)]
+    out.flush()
+
+    if args.memo_stats:
+        workers = f" across {args.jobs} workers" if pooled else ""
+        print(f"memo: {counts[0]} hits, {counts[1]} misses, {counts[2]} entries{workers}", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,16 +1,72 @@
+import argparse
 import json
+
+# Folds are left-deep unless --balanced asks for trees of logarithmic depth
+balanced = False
+
+# "Exactly one" is pairwise unless --exactly-one picks a compact encoding
+exactly_one = "pairwise"
+
+def balanced_fold(connective, xs, lo=0, hi=None):
+    """xs[lo:hi] folded as B/q7.py's balanced_pieces folds its parts."""
+    hi = len(xs) if hi is None else hi
+    if hi - lo == 1:
+        return xs[lo]
+    mid = lo + (hi - lo + 1) // 2
+    return f"{connective}({balanced_fold(connective, xs, lo, mid)},{balanced_fold(connective, xs, mid, hi)})"
+
+def conj(xs):
+    if balanced:
+        return balanced_fold("&", xs)
+    r = xs[0]
+    for x in xs[1:]:
+        r = f"&({r},{x})"
+    return r
+
+def disj(xs):
+    if balanced:
+        return balanced_fold("|", xs)
+    r = xs[0]
+    for x in xs[1:]:
+        r = f"|({r},{x})"
+    return r
+
+def bisection(atoms, lo=0, hi=None):
+    """As B/q7.py's bisection."""
+    hi = len(atoms) if hi is None else hi
+    if hi - lo == 1:
+        return atoms[lo]
+    mid = lo + (hi - lo + 1) // 2
+    left_none = conj([f"!({atom})" for atom in atoms[lo:mid]])
+    right_none = conj([f"!({atom})" for atom in atoms[mid:hi]])
+    return f"|(&({bisection(atoms, lo, mid)},{right_none}),&({left_none},{bisection(atoms, mid, hi)}))"
+
+def ladder(atoms, counters):
+    """As B/q7.py's ladder."""
+    clauses = []
+    for i in range(len(atoms)):
+        if i < len(atoms) - 1:
+            clauses.append(f">({atoms[i]},{counters[i]})")
+        if 0 < i < len(atoms) - 1:
+            clauses.append(f">({counters[i - 1]},{counters[i]})")
+        if i > 0:
+            clauses.append(f">({atoms[i]},!({counters[i - 1]}))")
+    if not clauses:
+        return atoms[0]
+    return f"&({disj(atoms)},{conj(clauses)})"
+
+def compact_exactly_one(predicate, arguments, count):
+    atoms = [f"{predicate}[{i}]{arguments}" for i in range(count)]
+    if not atoms:
+        return ""
+    if exactly_one == "bisection":
+        return bisection(atoms)
+    return ladder(atoms, [f"{predicate}L[{i}]{arguments}" for i in range(count - 1)])
+
 def phi_Q(tm):
     n = len(tm["states"])
-    def conj(xs):
-        r = xs[0]
-        for x in xs[1:]:
-            r = f"&({r},{x})"
-        return r
-    def disj(xs):
-        r = xs[0]
-        for x in xs[1:]:
-            r = f"|({r},{x})"
-        return r
+    if exactly_one != "pairwise":
+        return f"@x({compact_exactly_one('Q', '(x)', n)})"
     terms = []
     for i in range(n):
         negs = [f"!(Q[{j}](x))" for j in range(n) if j != i]
@@ -19,5 +75,13 @@ def phi_Q(tm):
         terms.append(t)
     return f"@x({disj(terms)})"
 
-tm = json.loads(input())
-print(phi_Q(tm))
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--balanced", action="store_true", help="fold & and | as balanced trees instead of left-deep chains")
+    parser.add_argument("--exactly-one", choices=["pairwise", "bisection", "ladder"], default="pairwise",
+                        help="encoding of exactly one state or symbol")
+    args = parser.parse_args()
+    balanced = args.balanced
+    exactly_one = args.exactly_one
+    tm = json.loads(input())
+    print(phi_Q(tm))
@@ -1,8 +1,26 @@
+import argparse
 import json
+
+# Folds are left-deep unless --balanced asks for trees of logarithmic depth
+balanced = False
+
+# "Exactly one" is pairwise unless --exactly-one picks a compact encoding
+exactly_one = "pairwise"
+
+def balanced_fold(connective, xs, lo=0, hi=None):
+    """xs[lo:hi] folded as B/q7.py's balanced_pieces folds its parts."""
+    hi = len(xs) if hi is None else hi
+    if hi - lo == 1:
+        return xs[lo]
+    mid = lo + (hi - lo + 1) // 2
+    return f"{connective}({balanced_fold(connective, xs, lo, mid)},{balanced_fold(connective, xs, mid, hi)})"
+
 #Custom Code for Question 3
 def build_formula(data):
     syms = data["alphabet"]
     count = len(syms)
+    if exactly_one != "pairwise":
+        return f"@x(@y({compact_exactly_one('S', '(x,y)', count)}))"
     exprs = []
     for idx in range(count):
         neg_exprs = [f"!(S[{j}](x,y))" for j in range(count) if j != idx]#expressions for j != idx
@@ -16,6 +34,8 @@ def build_formula(data):
 def conj_nested(lst):
     if not lst:
         return ""
+    if balanced:
+        return balanced_fold("&", lst)
     acc = lst[0]
     for elem in lst[1:]:
         acc = f"&({acc},{elem})"
@@ -24,10 +44,52 @@ def conj_nested(lst):
 def disj_nested(lst):
     if not lst:
         return ""
+    if balanced:
+        return balanced_fold("|", lst)
     acc = lst[0]
     for elem in lst[1:]:
         acc = f"|({acc},{elem})"
     return acc
 
-tm = json.loads(input())
-print(build_formula(tm))
\ No newline at end of file
+def bisection(atoms, lo=0, hi=None):
+    """As B/q7.py's bisection."""
+    hi = len(atoms) if hi is None else hi
+    if hi - lo == 1:
+        return atoms[lo]
+    mid = lo + (hi - lo + 1) // 2
+    left_none = conj_nested([f"!({atom})" for atom in atoms[lo:mid]])
+    right_none = conj_nested([f"!({atom})" for atom in atoms[mid:hi]])
+    return f"|(&({bisection(atoms, lo, mid)},{right_none}),&({left_none},{bisection(atoms, mid, hi)}))"
+
+def ladder(atoms, counters):
+    """As B/q7.py's ladder."""
+    clauses = []
+    for i in range(len(atoms)):
+        if i < len(atoms) - 1:
+            clauses.append(f">({atoms[i]},{counters[i]})")
+        if 0 < i < len(atoms) - 1:
+            clauses.append(f">({counters[i - 1]},{counters[i]})")
+        if i > 0:
+            clauses.append(f">({atoms[i]},!({counters[i - 1]}))")
+    if not clauses:
+        return atoms[0]
+    return f"&({disj_nested(atoms)},{conj_nested(clauses)})"
+
+def compact_exactly_one(predicate, arguments, count):
+    atoms = [f"{predicate}[{i}]{arguments}" for i in range(count)]
+    if not atoms:
+        return ""
+    if exactly_one == "bisection":
+        return bisection(atoms)
+    return ladder(atoms, [f"{predicate}L[{i}]{arguments}" for i in range(count - 1)])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--balanced", action="store_true", help="fold & and | as balanced trees instead of left-deep chains")
+    parser.add_argument("--exactly-one", choices=["pairwise", "bisection", "ladder"], default="pairwise",
+                        help="encoding of exactly one state or symbol")
+    args = parser.parse_args()
+    balanced = args.balanced
+    exactly_one = args.exactly_one
+    tm = json.loads(input())
+    print(build_formula(tm))
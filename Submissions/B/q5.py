@@ -1,5 +1,20 @@
+import argparse
 import json
 
+# Folds are left-deep unless --balanced asks for trees of logarithmic depth
+balanced = False
+
+# Each transition restates the tape frame unless --factored-frame states it once
+factored_frame = False
+
+def balanced_fold(connective, xs, lo=0, hi=None):
+    """xs[lo:hi] folded as B/q7.py's balanced_pieces folds its parts."""
+    hi = len(xs) if hi is None else hi
+    if hi - lo == 1:
+        return xs[lo]
+    mid = lo + (hi - lo + 1) // 2
+    return f"{connective}({balanced_fold(connective, xs, lo, mid)},{balanced_fold(connective, xs, mid, hi)})"
+
 def phi_delta(tm):
     transitions = tm["transitions"]
     n = len(tm["alphabet"])
@@ -17,14 +32,26 @@ def phi_delta(tm):
             cons = right(q1, b, n)
         imp = f">({ant},{cons})"
         formulas.append(f"@x(@y({imp}))")
+    if factored_frame and formulas:
+        formulas.append(frame(tm))
     return conj(formulas)
 
+def frame(tm):
+    # Where any transition applies, every cell but the head's keeps its symbol
+    guards = dict.fromkeys(f"&(Q[{t[0]}](x),S[{t[1]}](x,y))" for t in tm["transitions"])
+    pres = conj([
+        f">(S[{k}](x,z),S[{k}](s(x),z))" for k in range(len(tm["alphabet"]))
+    ])
+    return f"@x(@y(>(&(C(x,y),{disj(list(guards))}),@z(>(!(=(z,y)),{pres})))))"
+
 def left(q, b, n):
     main = conj([
         f"Q[{q}](s(x))",
         "#v(&(=(s(v),y),C(s(x),v)))",
         f"S[{b}](s(x),y)"
     ])
+    if factored_frame:
+        return main
     pres = conj([
         f">(S[{k}](x,z),S[{k}](s(x),z))" for k in range(n)
     ])
@@ -37,6 +64,8 @@ def right(q, b, n):
         "C(s(x),s(y))",
         f"S[{b}](s(x),y)"
     ])
+    if factored_frame:
+        return main
     pres = conj([
         f">(S[{k}](x,z),S[{k}](s(x),z))" for k in range(n)
     ])
@@ -46,12 +75,23 @@ def right(q, b, n):
 def conj(fs):
     if not fs:
         return ""
-    if len(fs) == 1:
-        return fs[0]
-    r = fs[0]
-    for f in fs[1:]:
-        r = f"&({r},{f})"
-    return r
-
-tm = json.loads(input().strip())
-print(phi_delta(tm))
+    if balanced:
+        return balanced_fold("&", fs)
+    # Every opening bracket comes first, so the fold is built in one pass
+    return "&(" * (len(fs) - 1) + fs[0] + "".join(f",{f})" for f in fs[1:])
+
+def disj(fs):
+    if balanced:
+        return balanced_fold("|", fs)
+    return "|(" * (len(fs) - 1) + fs[0] + "".join(f",{f})" for f in fs[1:])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--balanced", action="store_true", help="fold & and | as balanced trees instead of left-deep chains")
+    parser.add_argument("--factored-frame", action="store_true", help="state the tape frame once instead of in every transition")
+    args = parser.parse_args()
+    balanced = args.balanced
+    factored_frame = args.factored_frame
+    tm = json.loads(input().strip())
+    print(phi_delta(tm))
+
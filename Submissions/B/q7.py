@@ -1,5 +1,20 @@
+import argparse
+import itertools
+import sys
 import json
 
+# Opening brackets of a long fold are written this many at a time
+FOLD_BLOCK = 4096
+
+# Folds are left-deep unless --balanced asks for trees of logarithmic depth
+balanced = False
+
+# "Exactly one" is pairwise unless --exactly-one picks a compact encoding
+exactly_one = "pairwise"
+
+# Each transition restates the tape frame unless --factored-frame states it once
+factored_frame = False
+
 def phi_epsilon(tm):
     initial_state = tm["initial_state"]
     first_write = None
@@ -26,36 +41,39 @@ def phi_epsilon(tm):
     return phi_epsilon
 
 def phi_Q(tm):
+    return "".join(phi_Q_pieces(tm))
+
+def phi_Q_pieces(tm):
     n = len(tm["states"])
-    def conj(xs):
-        r = xs[0]
-        for x in xs[1:]:
-            r = f"&({r},{x})"
-        return r
-    def disj(xs):
-        r = xs[0]
-        for x in xs[1:]:
-            r = f"|({r},{x})"
-        return r
-    terms = []
-    for i in range(n):
+    if exactly_one != "pairwise":
+        yield f"@x({compact_exactly_one('Q', '(x)', n)})"
+        return
+    def term(i):
         negs = [f"!(Q[{j}](x))" for j in range(n) if j != i]
         q = f"Q[{i}](x)"
-        t = q if not negs else f"&({q},{conj(negs)})"
-        terms.append(t)
-    return f"@x({disj(terms)})"
+        return q if not negs else f"&({q},{conj_nested(negs)})"
+    yield "@x("
+    yield from fold_pieces("|", ((term(i),) for i in range(n)), n)
+    yield ")"
 
 def phi_delta(tm):
+    return "".join(phi_delta_pieces(tm))
+
+def phi_delta_pieces(tm):
     syms = tm["alphabet"]
     count = len(syms)
-    exprs = []
-    for idx in range(count):
+    if exactly_one != "pairwise":
+        yield f"@x(@y({compact_exactly_one('S', '(x,y)', count)}))"
+        return
+    def expr(idx):
         neg_exprs = [f"!(S[{j}](x,y))" for j in range(count) if j != idx]
         base_expr = f"S[{idx}](x,y)"
         if neg_exprs:
             base_expr = f"&({base_expr},{conj_nested(neg_exprs)})"
-        exprs.append(base_expr)
-    return f"@x(@y({disj_nested(exprs)}))"
+        return base_expr
+    yield "@x(@y("
+    yield from fold_pieces("|", ((expr(idx),) for idx in range(count)), count)
+    yield "))"
 
 def phi_C(tm):
     implication = ">(C(x,z),=(z,y))"
@@ -66,10 +84,12 @@ def phi_C(tm):
     return phi_C
 
 def phi_transitions(tm):
+    return "".join(phi_transitions_pieces(tm))
+
+def phi_transitions_pieces(tm):
     transitions = tm["transitions"]
     alphabet_size = len(tm["alphabet"])
-    phi_I_list = []
-    for transition in transitions:
+    def phi_I(transition):
         current_state, read_symbol, next_state, write_symbol, direction = transition
         antecedent_parts = [
             f"Q[{current_state}](x)",
@@ -82,9 +102,28 @@ def phi_transitions(tm):
         else:
             consequent = build_right_consequent(next_state, write_symbol, alphabet_size)
         implication = f">({antecedent},{consequent})"
-        phi_I = f"@x(@y({implication}))"
-        phi_I_list.append(phi_I)
-    return build_conjunction(phi_I_list)
+        return f"@x(@y({implication}))"
+    if factored_frame and transitions:
+        parts = itertools.chain(((phi_I(transition),) for transition in transitions), [(phi_frame(tm),)])
+        yield from fold_pieces("&", parts, len(transitions) + 1)
+        return
+    yield from fold_pieces("&", ((phi_I(transition),) for transition in transitions), len(transitions))
+
+def phi_frame(tm):
+    """
+        The tape frame of every transition stated once: wherever some
+        transition applies, every cell but the head's keeps its symbol.
+        Equivalent to the copy in each transition's consequent, since
+        @x@y(a > (b & f)) is @x@y(a > b) & @x@y(a > f).
+    """
+    guards = dict.fromkeys(
+        f"&(Q[{current_state}](x),S[{read_symbol}](x,y))"
+        for current_state, read_symbol, *_ in tm["transitions"]
+    )
+    preservation_conjunction = build_conjunction([
+        f">(S[{k}](x,z),S[{k}](s(x),z))" for k in range(len(tm["alphabet"]))
+    ])
+    return f"@x(@y(>(&(C(x,y),{disj_nested(list(guards))}),@z(>(!(=(z,y)),{preservation_conjunction})))))"
 
 def build_left_consequent(next_state, write_symbol, alphabet_size):
     main_parts = [
@@ -93,6 +132,8 @@ def build_left_consequent(next_state, write_symbol, alphabet_size):
         f"S[{write_symbol}](s(x),y)"
     ]
     main_conjunction = build_conjunction(main_parts)
+    if factored_frame:
+        return main_conjunction
     preservation_implications = []
     for k in range(alphabet_size):
         preservation_implications.append(f">(S[{k}](x,z),S[{k}](s(x),z))")
@@ -108,6 +149,8 @@ def build_right_consequent(next_state, write_symbol, alphabet_size):
         f"S[{write_symbol}](s(x),y)"
     ]
     main_conjunction = build_conjunction(main_parts)
+    if factored_frame:
+        return main_conjunction
     preservation_implications = []
     for k in range(alphabet_size):
         preservation_implications.append(f">(S[{k}](x,z),S[{k}](s(x),z))")
@@ -124,41 +167,120 @@ def phi_halt(tm):
         return "#x(Q[1](x))"
     return "#x(Q[0](x))"
 
+def fold_pieces(connective, parts, count):
+    """
+        The left-deep fold &(&(a,b),c) written piece by piece: all opening
+        brackets come first, then each part after the first closes one.
+        parts yields count iterables of pieces and may be a generator, so
+        only the part being written is ever held in memory.
+    """
+    if count == 0:
+        return
+    if balanced:
+        yield from balanced_pieces(connective, iter(parts), count)
+        return
+    opening = f"{connective}("
+    for start in range(0, count - 1, FOLD_BLOCK):
+        yield opening * min(FOLD_BLOCK, count - 1 - start)
+    for i, part in enumerate(parts):
+        if i > 0:
+            yield ","
+        yield from part
+        if i > 0:
+            yield ")"
+
+def balanced_pieces(connective, parts, count):
+    """
+        The next count parts folded as &(&(a,b),&(c,d)), the first half
+        on the left, so the nesting is ceil(log2(count)) deep.
+    """
+    if count == 1:
+        yield from next(parts)
+        return
+    half = (count + 1) // 2
+    yield f"{connective}("
+    yield from balanced_pieces(connective, parts, half)
+    yield ","
+    yield from balanced_pieces(connective, parts, count - half)
+    yield ")"
+
 def build_conjunction(formulas):
-    if not formulas:
-        return ""
-    if len(formulas) == 1:
-        return formulas[0]
-    result = formulas[0]
-    for formula in formulas[1:]:
-        result = f"&({result},{formula})"
-    return result
+    return "".join(fold_pieces("&", ((formula,) for formula in formulas), len(formulas)))
 
 def conj_nested(lst):
-    if not lst:
-        return ""
-    acc = lst[0]
-    for elem in lst[1:]:
-        acc = f"&({acc},{elem})"
-    return acc
+    return "".join(fold_pieces("&", ((elem,) for elem in lst), len(lst)))
 
 def disj_nested(lst):
-    if not lst:
+    return "".join(fold_pieces("|", ((elem,) for elem in lst), len(lst)))
+
+def bisection(atoms, lo=0, hi=None):
+    """
+        Exactly one of atoms[lo:hi], equivalent to the pairwise form: the
+        true atom is in one half and the other half is all false. Each
+        level of halving writes every atom once, so the size is O(n log n).
+    """
+    hi = len(atoms) if hi is None else hi
+    if hi - lo == 1:
+        return atoms[lo]
+    mid = lo + (hi - lo + 1) // 2
+    left_none = conj_nested([f"!({atom})" for atom in atoms[lo:mid]])
+    right_none = conj_nested([f"!({atom})" for atom in atoms[mid:hi]])
+    return f"|(&({bisection(atoms, lo, mid)},{right_none}),&({left_none},{bisection(atoms, mid, hi)}))"
+
+def ladder(atoms, counters):
+    """
+        At least one of atoms, and at most one through a sequential counter:
+        counters[i] holds once one of atoms[0..i] does, and atoms[i] is
+        false once counters[i - 1] holds. O(n) in size, but the counters
+        are extra predicates, so it is only equisatisfiable with the
+        pairwise form.
+    """
+    clauses = []
+    for i in range(len(atoms)):
+        if i < len(atoms) - 1:
+            clauses.append(f">({atoms[i]},{counters[i]})")
+        if 0 < i < len(atoms) - 1:
+            clauses.append(f">({counters[i - 1]},{counters[i]})")
+        if i > 0:
+            clauses.append(f">({atoms[i]},!({counters[i - 1]}))")
+    if not clauses:
+        return atoms[0]
+    return f"&({disj_nested(atoms)},{conj_nested(clauses)})"
+
+def compact_exactly_one(predicate, arguments, count):
+    atoms = [f"{predicate}[{i}]{arguments}" for i in range(count)]
+    if not atoms:
         return ""
-    acc = lst[0]
-    for elem in lst[1:]:
-        acc = f"|({acc},{elem})"
-    return acc
+    if exactly_one == "bisection":
+        return bisection(atoms)
+    return ladder(atoms, [f"{predicate}L[{i}]{arguments}" for i in range(count - 1)])
 
 def phi_M(tm):
-    phi_eps = phi_epsilon(tm)
-    phi_q = phi_Q(tm)
-    phi_del = phi_delta(tm)
-    phi_c = phi_C(tm)
-    phi_trans = phi_transitions(tm)
-    phi_h = phi_halt(tm)
-    premises = build_conjunction([phi_eps, phi_q, phi_del, phi_c, phi_trans])
-    return f">({premises},{phi_h})"
-
-tm = json.loads(input().strip())
-print(phi_M(tm))
+    return "".join(phi_M_pieces(tm))
+
+def phi_M_pieces(tm):
+    premises = [
+        (phi_epsilon(tm),),
+        phi_Q_pieces(tm),
+        phi_delta_pieces(tm),
+        (phi_C(tm),),
+        phi_transitions_pieces(tm),
+    ]
+    yield ">("
+    yield from fold_pieces("&", premises, len(premises))
+    yield f",{phi_halt(tm)})"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--balanced", action="store_true", help="fold & and | as balanced trees instead of left-deep chains")
+    parser.add_argument("--exactly-one", choices=["pairwise", "bisection", "ladder"], default="pairwise",
+                        help="encoding of exactly one state or symbol")
+    parser.add_argument("--factored-frame", action="store_true", help="state the tape frame once instead of in every transition")
+    args = parser.parse_args()
+    balanced = args.balanced
+    exactly_one = args.exactly_one
+    factored_frame = args.factored_frame
+    tm = json.loads(input().strip())
+    # Written as it is produced, phi_M is never held in memory as one string
+    sys.stdout.writelines(phi_M_pieces(tm))
+    sys.stdout.write("\n")
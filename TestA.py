@@ -9,12 +9,15 @@ GREEN = '\033[92m'
 YELLOW = '\033[93m'
 ENDC = '\033[0m'
 
-def run_question_tests(question, root_path):
+# Q4's other evaluators, each run over the same samples as the default one
+Q4_BACKENDS = ["walk", "numpy", "memo"]
+
+def run_question_tests(question, root_path, args=()):
     base_dir = root_path / "Submissions" / "A"
     test_dir = base_dir / f"Assignment2PartA/Q{question}"
     script_path = base_dir / f"q{question}.py"
     
-    print(f"\n{YELLOW}=== Testing Question {question} ==={ENDC}")
+    print(f"\n{YELLOW}=== Testing Question {' '.join([str(question), *args])} ==={ENDC}")
     
     if not test_dir.exists():
         print(f"{RED}Test directory missing for Q{question}{ENDC}")
@@ -42,7 +45,7 @@ def run_question_tests(question, root_path):
             # Run from the root directory to maintain relative paths
             with open(input_file, 'r') as f_in:
                 result = subprocess.run(
-                    [sys.executable, str(script_path)],
+                    [sys.executable, str(script_path), *args],
                     stdin=f_in,
                     capture_output=True,
                     text=True,
@@ -90,19 +93,20 @@ def main():
     results = {}
     for q in [1, 2, 3, 4]:
         passed, total = run_question_tests(q, root_path)
-        results[q] = (passed, total)
+        results[f"Q{q}"] = (passed, total)
+    for backend in Q4_BACKENDS:
+        results[f"Q4 --backend {backend}"] = run_question_tests(4, root_path, ("--backend", backend))
     
     print(f"\n{YELLOW}📊 Final Results:{ENDC}")
     all_passed = True
-    for q in [1, 2, 3, 4]:
-        passed, total = results[q]
+    for name, (passed, total) in results.items():
         if passed < total:
             all_passed = False
             color = RED
         else:
             color = GREEN
             
-        print(f"Q{q}: {color}{passed}/{total} passed{ENDC}")
+        print(f"{name}: {color}{passed}/{total} passed{ENDC}")
     
     sys.exit(0 if all_passed else 1)
 
@@ -0,0 +1,305 @@
+import importlib.util
+import itertools
+import json
+import random
+import sys
+from pathlib import Path
+
+# Color formatting
+RED = '\033[91m'
+GREEN = '\033[92m'
+YELLOW = '\033[93m'
+ENDC = '\033[0m'
+
+ROOT = Path(__file__).parent
+SAMPLES = ROOT / "Submissions" / "B" / "Assignment2PartB"
+
+def load_script(part, question):
+    # The submissions are standalone scripts, so load them by path
+    path = ROOT / "Submissions" / part / f"q{question}.py"
+    spec = importlib.util.spec_from_file_location(f"{part.lower()}_q{question}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def sample_machines():
+    for path in sorted(SAMPLES.glob("sample*_machine.json")) + sorted(SAMPLES.glob("sample*_input.txt")):
+        yield path.name, json.loads(path.read_text())
+
+def random_model(rng, tm, size):
+    """
+        A structure over phi_M's vocabulary. Most cells keep their symbols
+        from x to s(x), and every transition that applies is then made to
+        take its step, so the frame is what tells the models apart.
+    """
+    domain = [str(i) for i in range(size)]
+    successor = { d: rng.choice(domain) for d in domain }
+    states = sorted(set(tm["states"]) | set(range(len(tm["states"]))))
+    symbols = sorted(set(tm["alphabet"]) | set(range(len(tm["alphabet"]))))
+    tape = { (x, z): { k for k in symbols if rng.random() < 0.3 } for x in domain for z in domain }
+    for x in domain:
+        for z in domain:
+            if rng.random() < 0.8:
+                tape[(successor[x], z)] = set(tape[(x, z)])
+    state = { x: { q for q in states if rng.random() < 0.3 } for x in domain }
+    head = { (x, y) for x in domain for y in domain if rng.random() < 0.4 }
+
+    changed = True
+    while changed:
+        changed = False
+        for current_state, read_symbol, next_state, write_symbol, direction in tm["transitions"]:
+            for x, y in list(head):
+                if current_state not in state[x] or read_symbol not in tape[(x, y)]:
+                    continue
+                sx = successor[x]
+                if direction == -1:
+                    moved = [(sx, v) for v in domain if successor[v] == y]
+                    moved = [pair for pair in moved if pair in head] or moved[:1]
+                else:
+                    moved = [(sx, successor[y])]
+                for fact, facts in [(next_state, state[sx]), (write_symbol, tape[(sx, y)])]:
+                    if fact not in facts:
+                        facts.add(fact)
+                        changed = True
+                if not head.issuperset(moved):
+                    head.update(moved)
+                    changed = True
+
+    interpretations = {
+        "s": successor,
+        "C": [f"{x},{y}" for x, y in head],
+        "0": domain[0],
+        "1": domain[-1],
+    }
+    for q in states:
+        interpretations[f"Q[{q}]"] = [x for x in domain if q in state[x]]
+    for k in symbols:
+        interpretations[f"S[{k}]"] = [f"{x},{z}" for (x, z), held in tape.items() if k in held]
+    return json.dumps({ "domain": domain, "interpretations": interpretations })
+
+def truth(q4, model, formula):
+    expr = q4.nnf_simplify(q4.parse_prefix_string(formula))
+    return q4.compile_expression(model, expr, None, {})(model.bind({}))
+
+def run_frame_tests(q4, q5, q7):
+    print(f"\n{YELLOW}=== Testing the factored frame axiom ==={ENDC}")
+    passed = 0
+    total = 0
+    for name, tm in sample_machines():
+        total += 1
+        formulas = {}
+        for factored in [False, True]:
+            q5.factored_frame = q7.factored_frame = factored
+            formulas[factored] = (q7.phi_transitions(tm), q7.phi_M(tm))
+            if q5.phi_delta(tm) != formulas[factored][0]:
+                print(f"{RED}{name}: B/q5 and B/q7 disagree on phi_transitions{ENDC}")
+                break
+        q5.factored_frame = q7.factored_frame = False
+        if len(formulas) < 2:
+            continue
+
+        rng = random.Random(name)
+        outcomes = set()
+        ok = True
+        for _ in range(300):
+            model_json = random_model(rng, tm, rng.randrange(1, 4))
+            model = q4.Model.from_json(model_json)
+            local = [truth(q4, model, formula) for formula in formulas[False]]
+            factored = [truth(q4, model, formula) for formula in formulas[True]]
+            if local != factored:
+                print(f"{RED}{name}: the encodings disagree on {model_json}{ENDC}")
+                ok = False
+                break
+            outcomes.add(local[0])
+        if ok and outcomes != { False, True }:
+            print(f"{RED}{name}: phi_transitions was never {not outcomes.pop()}, the models are too weak{ENDC}")
+            ok = False
+        if ok:
+            sizes = " -> ".join(f"{len(formulas[factored][0]):,}" for factored in [False, True])
+            print(f"{GREEN}{name} passed! phi_transitions characters {sizes}{ENDC}")
+            passed += 1
+    return passed, total
+
+ENCODERS = [
+    ("phi_epsilon", "construct_empty_formula"),
+    ("phi_Q", "construct_state_formula"),
+    ("phi_delta", "construct_symbol_formula"),
+    ("phi_C", "construct_cell_formula"),
+    ("phi_transitions", "construct_transitions_formula"),
+    ("phi_halt", "construct_halt_formula"),
+    ("phi_M", "construct_machine_formula"),
+]
+
+def run_encoder_tests(q4, q7):
+    print(f"\n{YELLOW}=== Testing A/q4.py's shared-node encoders against B/q7.py ==={ENDC}")
+    rng = random.Random(2)
+    machines = [(name, tm) for name, tm in sample_machines()]
+    machines += [(f"random machine {i}", random_machine(rng, rng.randrange(1, 7), rng.randrange(1, 6))) for i in range(30)]
+    passed = 0
+    total = 0
+    for options in itertools.product([False, True], ["pairwise", "bisection", "ladder"], [False, True]):
+        total += 1
+        q4.balanced, q4.exactly_one, q4.factored_frame = q7.balanced, q7.exactly_one, q7.factored_frame = options
+        ok = True
+        for (name, tm), (encoder, constructor) in itertools.product(machines, ENCODERS):
+            machine = q4.TuringMachine.from_json(json.dumps(tm))
+            if getattr(q4, constructor)(machine).as_prefix_str() != getattr(q7, encoder)(tm):
+                print(f"{RED}{name}: {constructor} and {encoder} differ with {options}{ENDC}")
+                ok = False
+                break
+        if ok:
+            print(f"{GREEN}balanced={options[0]} exactly_one={options[1]} factored_frame={options[2]} passed!{ENDC}")
+            passed += 1
+    q4.balanced, q4.exactly_one, q4.factored_frame = q7.balanced, q7.exactly_one, q7.factored_frame = False, "pairwise", False
+    return passed, total
+
+def reference_run(tm, budget, word=()):
+    # The plain reading of a run, one dict lookup per step
+    moves = {}
+    for state, read, next_state, write, direction in tm["transitions"]:
+        if state not in [tm["accept_state"], tm["reject_state"]]:
+            moves.setdefault((state, read), (next_state, write, direction))
+    index = { symbol: i for i, symbol in enumerate(tm["alphabet"]) }
+    tape = { 0: 1, **{ i + 1: index[symbol] for i, symbol in enumerate(word) } }
+    state, head, steps = tm["initial_state"], 1, 0
+    while steps < budget and (state, tape.get(head, 0)) in moves:
+        state, tape[head], direction = moves[(state, tape.get(head, 0))]
+        head = max(0, head + direction)
+        steps += 1
+    cells = [tape.get(i, 0) for i in range(1, max(tape) + 1)]
+    while cells and cells[-1] == 0:
+        cells.pop()
+    return state, head, steps, (state, tape.get(head, 0)) not in moves, [tm["alphabet"][i] for i in cells]
+
+def random_machine(rng, states, symbols):
+    return {
+        "states": list(range(states)),
+        "alphabet": sorted(rng.sample(range(symbols * 3), symbols)),
+        "transitions": [
+            [q, a, rng.randrange(states), rng.randrange(symbols), rng.choice([-1, 1])]
+            for q in range(states) for a in range(symbols) if rng.random() < 0.9
+        ],
+        "initial_state": 0,
+        "accept_state": 1,
+        "reject_state": 2,
+    }
+
+def run_simulator_tests(q4):
+    print(f"\n{YELLOW}=== Testing the machine simulator ==={ENDC}")
+    rng = random.Random(0)
+    machines = list(sample_machines())
+    machines += [(f"random machine {i}", random_machine(rng, rng.randrange(3, 8), rng.randrange(2, 6))) for i in range(200)]
+    # More symbols than a bytearray cell holds
+    machines.append(("wide alphabet", random_machine(rng, 4, 300)))
+    for name, tm in machines:
+        machine = q4.TuringMachine.from_json(json.dumps(tm))
+        for budget in [0, 1, 7, 500, 5000]:
+            word = [rng.choice(tm["alphabet"]) for _ in range(rng.randrange(4))]
+            run = machine.run(budget, word)
+            actual = (machine.states[run.state], run.head, run.steps, run.halted, machine.word(run))
+            expected = reference_run(tm, budget, word)
+            if actual != expected:
+                print(f"{RED}{name} ran for {budget} steps on {word} to {actual}, not {expected}{ENDC}")
+                return 0, 1
+    print(f"{GREEN}{len(machines)} machines passed!{ENDC}")
+    return 1, 1
+
+# Halts in three steps and does not rely on phi_epsilon's reading of the initial transitions
+HALTING_MACHINE = {
+    "states": [0, 1, 2, 3, 4],
+    "alphabet": [0, 1, 5],
+    "transitions": [[0, 0, 3, 0, 1], [3, 0, 4, 2, -1], [4, 0, 1, 0, 1]],
+    "initial_state": 0,
+    "accept_state": 1,
+    "reject_state": 2,
+}
+
+def run_history_tests(q4, q7):
+    print(f"\n{YELLOW}=== Testing the history models ==={ENDC}")
+    passed = 0
+    total = 0
+    rng = random.Random(1)
+    machines = [(name, tm) for name, tm in sample_machines()]
+    machines += [(f"random machine {i}", random_machine(rng, rng.randrange(3, 6), rng.randrange(2, 5))) for i in range(40)]
+
+    total += 1
+    ok = True
+    for name, tm in machines:
+        machine = q4.TuringMachine.from_json(json.dumps(tm))
+        budget = rng.randrange(0, 25)
+        history = machine.trace(budget)
+        for time in range(budget + 1):
+            run = machine.run(time)
+            cells = [history.symbol(time, cell) for cell in range(budget + 2)]
+            if (history.states[time], history.heads[time], cells) != (run.state, run.head, list(run.tape[:budget + 2])):
+                print(f"{RED}{name}: the history and a {time} step run disagree{ENDC}")
+                ok = False
+                break
+        if not ok:
+            break
+        if budget < 8:
+            model = q4.history_model(machine, history)
+            written = q4.Model.from_json(q4.history_model_json(machine, history))
+            for (symbol, arity), relation in model.predicates.items():
+                other = written.relation(symbol, arity)
+                ids = [written.ids[element] for element in model.domain]
+                for position in range(model.size ** arity):
+                    args = divmod(position, model.size) if arity == 2 else (position,)
+                    if relation.holds(tuple(args)) != other.holds(tuple(ids[arg] for arg in args)):
+                        print(f"{RED}{name}: {symbol} differs once written as JSON{ENDC}")
+                        ok = False
+    if ok:
+        print(f"{GREEN}traces passed!{ENDC}")
+        passed += 1
+
+    # Whatever the machine does, a history has one state, one symbol per cell and one head per time
+    total += 1
+    ok = True
+    for name, tm in machines[:20]:
+        machine = q4.TuringMachine.from_json(json.dumps(tm))
+        model = q4.history_model(machine, machine.trace(rng.randrange(1, 12)))
+        for encoding in ["pairwise", "bisection", "ladder"]:
+            q7.exactly_one = encoding
+            for part in [q7.phi_Q, q7.phi_delta, q7.phi_C]:
+                if not truth(q4, model, part(tm)):
+                    print(f"{RED}{name}: {part.__name__} with the {encoding} encoding is false on the run{ENDC}")
+                    ok = False
+        q7.exactly_one = "pairwise"
+    if ok:
+        print(f"{GREEN}structure passed!{ENDC}")
+        passed += 1
+
+    total += 1
+    machine = q4.TuringMachine.from_json(json.dumps(HALTING_MACHINE))
+    history = machine.trace(10)
+    model = q4.history_model(machine, history)
+    parts = [q7.phi_epsilon, q7.phi_Q, q7.phi_delta, q7.phi_C, q7.phi_transitions, q7.phi_halt, q7.phi_M]
+    false = [part.__name__ for part in parts if not truth(q4, model, part(HALTING_MACHINE))]
+    if history.halted and history.steps == 3 and not false:
+        print(f"{GREEN}halting run passed!{ENDC}")
+        passed += 1
+    else:
+        print(f"{RED}halting run: halted {history.halted} after {history.steps} steps, false: {false}{ENDC}")
+    return passed, total
+
+def main():
+    print(f"{YELLOW}🚀 Starting machine test suite...{ENDC}")
+
+    q4 = load_script("A", 4)
+    results = {}
+    results["Frame axiom"] = run_frame_tests(q4, load_script("B", 5), load_script("B", 7))
+    results["Encoders"] = run_encoder_tests(q4, load_script("B", 7))
+    results["Simulator"] = run_simulator_tests(q4)
+    results["History"] = run_history_tests(q4, load_script("B", 7))
+
+    print(f"\n{YELLOW}📊 Final Results:{ENDC}")
+    all_passed = True
+    for name, (passed, total) in results.items():
+        color = GREEN if passed == total else RED
+        all_passed = all_passed and passed == total
+        print(f"{name}: {color}{passed}/{total} passed{ENDC}")
+
+    sys.exit(0 if all_passed else 1)
+
+if __name__ == "__main__":
+    main()
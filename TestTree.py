@@ -0,0 +1,210 @@
+import importlib.util
+import random
+import sys
+from pathlib import Path
+
+# Color formatting
+RED = '\033[91m'
+GREEN = '\033[92m'
+YELLOW = '\033[93m'
+ENDC = '\033[0m'
+
+ROOT = Path(__file__).parent
+
+def load_script(question):
+    # The submissions are standalone scripts, so load them by path
+    path = ROOT / "Submissions" / "A" / f"q{question}.py"
+    spec = importlib.util.spec_from_file_location(f"a_q{question}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# Uncached reference versions of the analysis attributes
+
+def quantifier(e):
+    return e.value[:1] in ["@", "#"]
+
+def expected_size(e):
+    return 1 + sum(expected_size(c) for c in e.children)
+
+def expected_depth(e):
+    return max((expected_depth(c) for c in e.children), default=0) + quantifier(e)
+
+def expected_free(e):
+    if quantifier(e):
+        return expected_free(e.child) - { e.value[1:] }
+    if not e.children:
+        return { e.value }
+    return set().union(*(expected_free(c) for c in e.children))
+
+def nodes_of(e):
+    yield e
+    for c in e.children:
+        yield from nodes_of(c)
+
+def cache_everything(tree):
+    for node in nodes_of(tree):
+        node.size(), node.quantifier_depth(), node.free_variables()
+
+def cache_matches(tree):
+    # Queried from the root down, so a stale root is caught before it is recomputed
+    return all(
+        node.size() == expected_size(node)
+        and node.quantifier_depth() == expected_depth(node)
+        and node.free_variables() == expected_free(node)
+        for node in nodes_of(tree)
+    )
+
+def random_formula(rng, depth, bound=()):
+    variables = list(bound) or ["c"]
+    if depth == 0:
+        return rng.choice([f"P({rng.choice(variables)})", f"R({rng.choice(variables)},f(c))", "A"])
+    kind = rng.randrange(5)
+    if kind < 2:
+        var = rng.choice("xyz")
+        return f"{'@#'[kind]}{var}({random_formula(rng, depth - 1, bound + (var,))})"
+    if kind == 2:
+        return f"!({random_formula(rng, depth - 1, bound)})"
+    op = "&|>"[rng.randrange(3)]
+    return f"{op}({random_formula(rng, depth - 1, bound)},{random_formula(rng, depth - 1, bound)})"
+
+def deepest_with_children(tree, count):
+    return [node for node in nodes_of(tree) if len(node.children) == count][-1]
+
+# Each mutation changes a node below the root after the whole tree is cached
+
+def mutate_left(q, tree, rng):
+    node = deepest_with_children(tree, 2)
+    node.left = q.parse_prefix_string(random_formula(rng, 2))
+    return tree
+
+def mutate_right(q, tree, rng):
+    node = deepest_with_children(tree, 2)
+    node.right = q.parse_prefix_string(random_formula(rng, 2))
+    return tree
+
+def mutate_child(q, tree, rng):
+    node = deepest_with_children(tree, 1)
+    node.child = q.parse_prefix_string(random_formula(rng, 2))
+    return tree
+
+def mutate_add_child(q, tree, rng):
+    # A new argument for the last atom, P(c) becomes P(c,g(y))
+    node = [node for node in nodes_of(tree) if node.value in ["P", "R"]][-1]
+    node.add_child(q.parse_prefix_string("g(y)"))
+    return tree
+
+def mutate_replace(q, tree, rng):
+    node = [node for node in nodes_of(tree) if node.parent is not None][-1]
+    node.replace(q.parse_prefix_string(random_formula(rng, 2)))
+    return tree
+
+def mutate_nnf(q, tree, rng):
+    return q.nnf_simplify(tree)
+
+def mutate_miniscope(q, tree, rng):
+    return q.miniscope(q.nnf_simplify(tree))
+
+MUTATIONS = {
+    "set_left": mutate_left,
+    "set_right": mutate_right,
+    "set_child": mutate_child,
+    "add_child": mutate_add_child,
+    "replace": mutate_replace,
+    "nnf_simplify": mutate_nnf,
+    "miniscope": mutate_miniscope,
+}
+
+def run_cache_tests(question, q):
+    print(f"\n{YELLOW}=== Testing Question {question} analysis cache ==={ENDC}")
+    passed = 0
+    total = 0
+    for name, mutate in MUTATIONS.items():
+        if name == "nnf_simplify" and not hasattr(q, "nnf_simplify"):
+            continue
+        if name == "miniscope" and not hasattr(q, "miniscope"):
+            continue
+        total += 1
+        rng = random.Random(question)
+        ok = True
+        for _ in range(200):
+            depth = rng.randrange(2, 6)
+            # Wrapped so there is always a binary node, a unary node and an atom to change
+            tree = q.parse_prefix_string(f"&({random_formula(rng, depth)},#x(!(&(P(x),{random_formula(rng, depth)}))))")
+            cache_everything(tree)
+            tree = mutate(q, tree, rng)
+            if not cache_matches(tree):
+                print(f"{RED}Stale cache after {name}: {tree.as_prefix_str()}{ENDC}")
+                ok = False
+                break
+        if ok:
+            print(f"{GREEN}{name} passed!{ENDC}")
+            passed += 1
+    return passed, total
+
+def run_children_tests(question, q):
+    print(f"\n{YELLOW}=== Testing Question {question} child lists ==={ENDC}")
+    # A list handed to the constructor stays the node's own, even while it is empty
+    children = []
+    node = q.ExpressionTree("P", children, None)
+    children.append(q.ExpressionTree("x", [], node))
+    leaf = q.parse_prefix_string("P")
+    leaf.add_child(q.ExpressionTree("y", [], leaf))
+    if node.children is not children or leaf.as_prefix_str() != "P(y)" or q.parse_prefix_string("Q").children:
+        print(f"{RED}Child lists are not kept: {node.as_prefix_str()}, {leaf.as_prefix_str()}{ENDC}")
+        return 0, 1
+    print(f"{GREEN}child lists passed!{ENDC}")
+    return 1, 1
+
+def run_signature_tests(q):
+    print(f"\n{YELLOW}=== Testing Question 2 cached signature ==={ENDC}")
+    rng = random.Random(0)
+    keys = ["predicates", "functions", "constants", "variables"]
+    for _ in range(200):
+        tree = q.parse_prefix_string(f"&({random_formula(rng, 4)},{random_formula(rng, 4)})")
+        tree.analysis("signature", q.subtree_signature)
+        mutate_left(q, tree, rng) if rng.random() < 0.5 else mutate_replace(q, tree, rng)
+        cached = { key: set() for key in keys }
+        q.get_expression_signature_and_variables(tree, cached)
+        fresh = { key: set() for key in keys }
+        q.get_expression_signature_and_variables(q.parse_prefix_string(tree.as_prefix_str()), fresh)
+        if cached != fresh:
+            print(f"{RED}Stale signature: {tree.as_prefix_str()}{ENDC}")
+            return 0, 1
+    print(f"{GREEN}signature passed!{ENDC}")
+    return 1, 1
+
+def run_shared_tests(q):
+    print(f"\n{YELLOW}=== Testing Question 4 analysis of shared nodes ==={ENDC}")
+    rng = random.Random(4)
+    for _ in range(200):
+        # Repeated halves, so the hash-consed form reaches one node along several paths
+        half = random_formula(rng, rng.randrange(2, 5))
+        tree = q.parse_shared(f"&(|({half},{half}),#x(&(P(x),{half})))", q.SharedNodes())
+        if not cache_matches(tree):
+            print(f"{RED}Wrong analysis of shared nodes: {tree.as_prefix_str()}{ENDC}")
+            return 0, 1
+    print(f"{GREEN}shared nodes passed!{ENDC}")
+    return 1, 1
+
+def main():
+    print(f"{YELLOW}🚀 Starting tree test suite...{ENDC}")
+
+    results = {}
+    for question in [2, 3, 4]:
+        results[f"Q{question}"] = run_cache_tests(question, load_script(question))
+        results[f"Q{question} child lists"] = run_children_tests(question, load_script(question))
+    results["Q2 signature"] = run_signature_tests(load_script(2))
+    results["Q4 shared nodes"] = run_shared_tests(load_script(4))
+
+    print(f"\n{YELLOW}📊 Final Results:{ENDC}")
+    all_passed = True
+    for name, (passed, total) in results.items():
+        color = GREEN if passed == total else RED
+        all_passed = all_passed and passed == total
+        print(f"{name}: {color}{passed}/{total} passed{ENDC}")
+
+    sys.exit(0 if all_passed else 1)
+
+if __name__ == "__main__":
+    main()